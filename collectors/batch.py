@@ -5,13 +5,83 @@ Supports collecting from text files and entire blocks.
 """
 
 import os
+import random
+import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.tools import is_tx
-from utils.collect_env import cast_block_run
+from utils.collect_env import cast_block_run, parse_env, cache_env
 from .transaction import collect_transaction_data
 
 
-def collect_from_file(file_name, output_folder=None, overwrite=False, max_attempts=3, endpoint="http://localhost:8545"):
+def _retry_delay(attempts):
+    """Exponential backoff (0.25s, 0.5s, 1s, ... capped at 8s) with jitter to spread out concurrent retries."""
+    return min(8.0, 0.25 * (2 ** (attempts - 1))) + random.random() * 0.1
+
+
+def _collect_with_retries(tx, output_folder, max_attempts, endpoint, pretty=False, source=""):
+    """Collect a single transaction, retrying up to max_attempts times. Returns True on success."""
+    attempts = 0
+    while attempts < max_attempts:
+        try:
+            collect_transaction_data(tx, output_folder, overwrite=False, endpoint=endpoint, pretty=pretty)
+            print(f"Success: collected transaction {tx}{source}")
+            return True
+        except ValueError as e:
+            # Invalid or unknown transactions fail the same way on every attempt
+            print(f"Failure: skipping transaction {tx}: {e}")
+            return False
+        except Exception as e:
+            attempts += 1
+            print(f"Failure: attempt {attempts} failed for transaction {tx}: {e}")
+            if attempts < max_attempts:
+                time.sleep(_retry_delay(attempts))
+            else:
+                print(f"Failure: skipping transaction {tx} after {max_attempts} failed attempts")
+    return False
+
+
+def _pending_transactions(tx_list, output_folder):
+    """Return the transactions without a finished result (the EIP-3155 trace is written last)."""
+    return [tx for tx in tx_list if not os.path.exists(f"{output_folder}/{tx}/txTraceEIP3155.json")]
+
+
+def _collect_batch(tx_list, output_folder, max_attempts, endpoint, workers, pretty=False, source=""):
+    """
+    Collect transactions concurrently with a thread pool.
+
+    Collection is dominated by RPC and cast round-trips, so threads overlap the
+    waiting. Each transaction writes to its own folder, so no locking is needed.
+
+    Returns:
+        Number of successfully collected transactions
+    """
+    successful = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        try:
+            futures = [
+                executor.submit(_collect_with_retries, tx, output_folder, max_attempts, endpoint, pretty, source)
+                for tx in tx_list
+            ]
+            for future in as_completed(futures):
+                if future.result():
+                    successful += 1
+        except BaseException:
+            # on Ctrl-C or an error, drop the queued transactions instead of collecting them all
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return successful
+
+
+def collect_from_file(
+    file_name,
+    output_folder=None,
+    overwrite=False,
+    max_attempts=3,
+    endpoint="http://localhost:8545",
+    workers=8,
+    pretty=False,
+):
     """
     Collect data for all transactions listed in a text file.
 
@@ -21,6 +91,8 @@ def collect_from_file(file_name, output_folder=None, overwrite=False, max_attemp
         overwrite: Whether to overwrite existing results
         max_attempts: Maximum retry attempts per transaction
         endpoint: RPC endpoint URL
+        workers: Number of transactions collected concurrently
+        pretty: Whether to indent txTest.json and txStats.json
 
     Returns:
         Dictionary with timing statistics
@@ -31,33 +103,30 @@ def collect_from_file(file_name, output_folder=None, overwrite=False, max_attemp
 
     if overwrite and os.path.exists(output_folder):
         print(f"Deleting existing folder to overwrite {output_folder}")
-        os.system(f"rm -rf {output_folder}")
+        shutil.rmtree(output_folder, ignore_errors=True)
 
     # Read transaction hashes from file
     with open(file_name, "r", encoding="utf-8") as file:
-        tx_list = [line.strip() for line in file.readlines() if is_tx(line.strip())]
+        tx_list = [tx for tx in (line.strip() for line in file) if is_tx(tx)]
+
+    # Drop duplicate hashes, keeping the first occurrence
+    tx_list = list(dict.fromkeys(tx_list))
+
+    # Resume an interrupted batch by skipping transactions that are already collected
+    skipped = 0
+    if not overwrite:
+        pending = _pending_transactions(tx_list, output_folder)
+        skipped = len(tx_list) - len(pending)
+        tx_list = pending
+        if skipped > 0:
+            print(f"Skipping {skipped} already collected transactions")
 
     start_time = time.time()
     total_transactions = len(tx_list)
-    successful = 0
 
     print(f"Processing {total_transactions} transactions from {file_name}")
 
-    for tx in tx_list:
-        attempts = 0
-        while attempts < max_attempts:
-            try:
-                collect_transaction_data(tx, output_folder, overwrite=False, endpoint=endpoint)
-                print(f"Success: collected transaction {tx}")
-                successful += 1
-                break
-            except Exception as e:
-                attempts += 1
-                print(f"Failure: attempt {attempts} failed for transaction {tx}: {e}")
-                if attempts < max_attempts:
-                    time.sleep(2)
-                else:
-                    print(f"Failure: skipping transaction {tx} after {max_attempts} failed attempts")
+    successful = _collect_batch(tx_list, output_folder, max_attempts, endpoint, workers, pretty)
 
     end_time = time.time()
     total_time = end_time - start_time
@@ -69,6 +138,7 @@ def collect_from_file(file_name, output_folder=None, overwrite=False, max_attemp
         "total_transactions": total_transactions,
         "successful": successful,
         "failed": total_transactions - successful,
+        "skipped": skipped,
     }
 
     print("\nCollection complete:")
@@ -85,6 +155,8 @@ def collect_from_block(
     overwrite=False,
     max_attempts=3,
     endpoint="http://localhost:8545",
+    workers=8,
+    pretty=False,
 ):
     """
     Collect data for all transactions from a specific block.
@@ -95,6 +167,8 @@ def collect_from_block(
         overwrite: Whether to overwrite existing results
         max_attempts: Maximum retry attempts per transaction
         endpoint: RPC endpoint URL
+        workers: Number of transactions collected concurrently
+        pretty: Whether to indent txTest.json and txStats.json
 
     Returns:
         Dictionary with timing statistics
@@ -103,35 +177,40 @@ def collect_from_block(
     block_data = cast_block_run(block_number, endpoint)
     block_tx_list = block_data.get("transactions", [])
 
+    # Every transaction shares this block's environment, cache it once for all of them
+    cache_env(block_number, endpoint, parse_env(block_data))
+
     os.makedirs(output_folder, exist_ok=True)
     block_folder_prefix = f"{output_folder}/{block_number}"
 
     # Create result directory if it doesn't exist
     if overwrite and os.path.exists(block_folder_prefix):
         print(f"Deleting existing block folder to overwrite {block_number}")
-        os.system(f"rm -rf {block_folder_prefix}")
+        shutil.rmtree(block_folder_prefix, ignore_errors=True)
+
+    # Resume a partially collected block by skipping transactions that are already collected
+    skipped = 0
+    if not overwrite:
+        pending = _pending_transactions(block_tx_list, block_folder_prefix)
+        skipped = len(block_tx_list) - len(pending)
+        block_tx_list = pending
+        if skipped > 0:
+            print(f"Skipping {skipped} already collected transactions from block {block_number}")
 
     start_time = time.time()
     total_transactions = len(block_tx_list)
-    successful = 0
 
     print(f"Processing {total_transactions} transactions from block {block_number}")
 
-    for tx in block_tx_list:
-        attempts = 0
-        while attempts < max_attempts:
-            try:
-                collect_transaction_data(tx, block_folder_prefix, overwrite=False, endpoint=endpoint)
-                print(f"Success: collected transaction {tx} from block {block_number}")
-                successful += 1
-                break
-            except Exception as e:
-                attempts += 1
-                print(f"Failure: attempt {attempts} failed for transaction {tx}: {e}")
-                if attempts < max_attempts:
-                    time.sleep(2)
-                else:
-                    print(f"Failure: skipping transaction {tx} after {max_attempts} failed attempts")
+    successful = _collect_batch(
+        block_tx_list,
+        block_folder_prefix,
+        max_attempts,
+        endpoint,
+        workers,
+        pretty,
+        source=f" from block {block_number}",
+    )
 
     end_time = time.time()
     total_time = end_time - start_time
@@ -143,6 +222,7 @@ def collect_from_block(
         "total_transactions": total_transactions,
         "successful": successful,
         "failed": total_transactions - successful,
+        "skipped": skipped,
     }
 
     print("\nBlock collection complete:")
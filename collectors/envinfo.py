@@ -5,30 +5,69 @@ Collects transaction details, block environment, and pre-transaction state value
 """
 
 import os
-import json
-from utils.tools import convert_hexbytes_to_str
+import shutil
+from utils.tools import convert_hexbytes_to_str, write_json
+from utils.rpc_batch import batch_call, get_result
 from utils.collect_transaction import collect_transaction
-from utils.collect_env import collect_env
-from utils.collect_pre import collect_pre
+from utils.collect_env import collect_env, block_request, parse_env, get_cached_env, cache_env
+from utils.collect_pre import collect_pre_storage, account_state_requests, parse_account_states
 
 
-def collect_envinfo(transaction_hash, endpoint="http://localhost:8545"):
+def collect_envinfo(transaction_hash, endpoint="http://localhost:8545", arena=None, transaction_info=None):
     """
     Collect environment information for a transaction.
 
     Args:
         transaction_hash: The transaction hash to collect data for
         endpoint: RPC endpoint URL (default: localhost:8545)
+        arena: Optional arena from an earlier cast run of this transaction,
+            reused for the pre-state instead of tracing again
+        transaction_info: Optional (transaction, block_num) tuple already returned
+            by collect_transaction, skipping the lookup
 
     Returns:
         Dictionary containing transaction environment information
     """
-    # Collect transaction information, block environment, pre-transaction values
-    transaction, block_num = collect_transaction(transaction_hash, endpoint)
+    # Collect transaction information, block number is needed for the rest
+    if transaction_info is None:
+        transaction_info = collect_transaction(transaction_hash, endpoint)
+    transaction, block_num = transaction_info
     transaction["secretKey"] = "0x45a915e4d060149eb4365960e6a7a45f334393093061116b197e3240065ff2d8"
 
-    block_env = collect_env(block_num, endpoint)
-    pre_dict = collect_pre(transaction_hash, block_num, endpoint)
+    # Collect accessed addresses and their storage from the trace
+    address_list, storage_by_address = collect_pre_storage(transaction_hash, endpoint, arena)
+
+    # Fetch block environment (unless cached) and pre-transaction account state in a single batch
+    block_env = get_cached_env(block_num, endpoint)
+    calls = [] if block_env is not None else [block_request(block_num)]
+    account_offset = len(calls)
+    for address in address_list:
+        calls.extend(account_state_requests(address, block_num - 1))
+    try:
+        responses = batch_call(endpoint, calls)
+    except Exception as e:
+        # Nodes without batch support get single calls instead
+        print(f"Batch request failed, falling back to single calls: {e}")
+        responses = None
+
+    if block_env is None:
+        block_data = None
+        if responses is not None:
+            try:
+                block_data = get_result(responses[0])
+            except RuntimeError as e:
+                print(f"Block request failed in batch, falling back to a single call: {e}")
+
+        if block_data is None:
+            block_env = collect_env(block_num, endpoint)
+        else:
+            block_env = parse_env(block_data)
+            cache_env(block_num, endpoint, block_env)
+
+    account_responses = responses[account_offset:] if responses is not None else None
+    pre_dict = parse_account_states(endpoint, address_list, block_num - 1, account_responses)
+    for address in address_list:
+        pre_dict[address]["storage"] = storage_by_address[address]
 
     # Post value remains unchanged
     post_value = {
@@ -47,7 +86,9 @@ def collect_envinfo(transaction_hash, endpoint="http://localhost:8545"):
     return envinfo
 
 
-def save_envinfo(transaction_hash, output_folder="envInfoResult", overwrite=False, endpoint="http://localhost:8545"):
+def save_envinfo(
+    transaction_hash, output_folder="envInfoResult", overwrite=False, endpoint="http://localhost:8545", pretty=False
+):
     """
     Collect and save environment information to a JSON file.
 
@@ -56,6 +97,7 @@ def save_envinfo(transaction_hash, output_folder="envInfoResult", overwrite=Fals
         output_folder: Base folder for output files
         overwrite: Whether to overwrite existing results
         endpoint: RPC endpoint URL
+        pretty: Whether to indent txTest.json
 
     Returns:
         True if successful
@@ -66,7 +108,7 @@ def save_envinfo(transaction_hash, output_folder="envInfoResult", overwrite=Fals
     # Create result directory if it doesn't exist
     if overwrite and os.path.exists(folder_prefix):
         print(f"Deleting existing folder to overwrite {transaction_hash}")
-        os.system(f"rm -rf {folder_prefix}")
+        shutil.rmtree(folder_prefix, ignore_errors=True)
 
     # Generate environment information output
     envinfo = collect_envinfo(transaction_hash, endpoint)
@@ -74,8 +116,6 @@ def save_envinfo(transaction_hash, output_folder="envInfoResult", overwrite=Fals
 
     # Convert HexBytes to strings and save as JSON
     envinfo = convert_hexbytes_to_str(envinfo)
-    json_string = json.dumps(envinfo, indent=2)
-    with open(f"{folder_prefix}/txTest.json", "w", encoding="utf-8") as json_file:
-        json_file.write(json_string)
+    write_json(envinfo, f"{folder_prefix}/txTest.json", pretty)
 
     return True
@@ -5,14 +5,16 @@ Combines environment information and statistics collection.
 """
 
 import os
-import json
-from utils.tools import is_tx, convert_hexbytes_to_str, cast_trace_run_with_steps
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.tools import is_tx, convert_hexbytes_to_str, cast_trace_run_with_steps, write_json
+from utils.collect_transaction import collect_transaction
 from utils.eip3155_simple import save_trace_lines_as_eip3155
 from .envinfo import collect_envinfo
 
 
 def collect_transaction_data(
-    transaction_hash, output_folder="result", overwrite=False, endpoint="http://localhost:8545"
+    transaction_hash, output_folder="result", overwrite=False, endpoint="http://localhost:8545", pretty=False
 ):
     """
     Collect complete data (envinfo + stats + EIP-3155 trace) for a transaction.
@@ -22,9 +24,15 @@ def collect_transaction_data(
         output_folder: Base folder for output files
         overwrite: Whether to overwrite existing results
         endpoint: RPC endpoint URL
+        pretty: Whether to indent txTest.json and txStats.json
 
     Returns:
         True if successful
+
+    Raises:
+        ValueError: If the transaction does not exist. Cast traces it before the lookup
+            is read, so a cast failure on an unknown hash is reported as this ValueError,
+            which batch collection does not retry
     """
     os.makedirs(output_folder, exist_ok=True)
     tx_folder_prefix = f"{output_folder}/{transaction_hash}"
@@ -32,16 +40,28 @@ def collect_transaction_data(
     # Create result directory if it doesn't exist
     if overwrite and os.path.exists(tx_folder_prefix):
         print(f"Deleting existing folder to overwrite {transaction_hash}")
-        os.system(f"rm -rf {tx_folder_prefix}")
+        shutil.rmtree(tx_folder_prefix, ignore_errors=True)
 
     os.makedirs(tx_folder_prefix, exist_ok=True)
 
-    # Collect environment info
-    env_info = collect_envinfo(transaction_hash, endpoint)
+    # Look up the transaction in the background while cast replays it, both are waits on the node
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        transaction_future = executor.submit(collect_transaction, transaction_hash, endpoint)
 
-    # Collect trace data with ordered steps and arena
-    print(f"Collecting trace data for {transaction_hash}")
-    trace_lines, arena = cast_trace_run_with_steps(transaction_hash, endpoint)
+        # Collect trace data with ordered steps and arena
+        print(f"Collecting trace data for {transaction_hash}")
+        try:
+            trace_lines, arena = cast_trace_run_with_steps(transaction_hash, endpoint)
+        except Exception:
+            # An unknown transaction fails cast too, raise the lookup's ValueError so callers do not retry it
+            lookup_error = transaction_future.exception()
+            if isinstance(lookup_error, ValueError):
+                raise lookup_error
+            raise
+        transaction_info = transaction_future.result()
+
+    # Collect environment info, reusing the arena for the pre-state
+    env_info = collect_envinfo(transaction_hash, endpoint, arena=arena, transaction_info=transaction_info)
 
     # Generate statistics from arena
     from .txstats import collect_lists
@@ -53,14 +73,10 @@ def collect_transaction_data(
     tx_stats = convert_hexbytes_to_str(tx_stats)
 
     # Save environment information
-    json_string_env = json.dumps(env_info, indent=2)
-    with open(f"{tx_folder_prefix}/txTest.json", "w", encoding="utf-8") as json_file:
-        json_file.write(json_string_env)
+    write_json(env_info, f"{tx_folder_prefix}/txTest.json", pretty)
 
     # Save statistics
-    json_string_stats = json.dumps(tx_stats, indent=2)
-    with open(f"{tx_folder_prefix}/txStats.json", "w", encoding="utf-8") as json_file:
-        json_file.write(json_string_stats)
+    write_json(tx_stats, f"{tx_folder_prefix}/txStats.json", pretty)
 
     # Save EIP-3155 trace from ordered trace lines (without opName for CuEVM compatibility)
     # Pass arena data for accurate gas values (fixes cast -t gas bugs after RETURN)
@@ -72,7 +88,20 @@ def collect_transaction_data(
     return True
 
 
-def collect_multiple_transactions(tx_hashes, output_folder="result", overwrite=False, endpoint="http://localhost:8545"):
+def _collect_one(tx_hash, output_folder, overwrite, endpoint, pretty):
+    """Collect a single transaction, reporting errors instead of raising. Returns True on success."""
+    try:
+        print(f"Collecting data for {tx_hash}")
+        collect_transaction_data(tx_hash, output_folder, overwrite, endpoint, pretty)
+        return True
+    except Exception as e:
+        print(f"Error collecting data for {tx_hash}: {e}")
+        return False
+
+
+def collect_multiple_transactions(
+    tx_hashes, output_folder="result", overwrite=False, endpoint="http://localhost:8545", pretty=False, workers=8
+):
     """
     Collect data for multiple transactions.
 
@@ -81,6 +110,8 @@ def collect_multiple_transactions(tx_hashes, output_folder="result", overwrite=F
         output_folder: Base folder for output files
         overwrite: Whether to overwrite existing results
         endpoint: RPC endpoint URL
+        pretty: Whether to indent txTest.json and txStats.json
+        workers: Maximum number of transactions collected concurrently
 
     Returns:
         Number of successfully processed transactions
@@ -92,18 +123,25 @@ def collect_multiple_transactions(tx_hashes, output_folder="result", overwrite=F
         else:
             tx_hashes = [tx_hashes]
 
-    # Filter valid transaction hashes
-    valid_hashes = [tx.strip() for tx in tx_hashes if is_tx(tx.strip())]
+    # Filter valid transaction hashes, dropping duplicates so no two workers write the same folder
+    valid_hashes = list(dict.fromkeys(tx for tx in (tx.strip() for tx in tx_hashes) if is_tx(tx)))
 
     print(f"Collecting data for {len(valid_hashes)} transactions")
 
+    # Transactions are independent and RPC-bound, collect them concurrently
     success_count = 0
-    for tx_hash in valid_hashes:
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(valid_hashes)))) as executor:
         try:
-            print(f"Collecting data for {tx_hash}")
-            collect_transaction_data(tx_hash, output_folder, overwrite, endpoint)
-            success_count += 1
-        except Exception as e:
-            print(f"Error collecting data for {tx_hash}: {e}")
+            futures = [
+                executor.submit(_collect_one, tx_hash, output_folder, overwrite, endpoint, pretty)
+                for tx_hash in valid_hashes
+            ]
+            for future in as_completed(futures):
+                if future.result():
+                    success_count += 1
+        except BaseException:
+            # on Ctrl-C or an error, drop the queued transactions instead of collecting them all
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
 
     return success_count
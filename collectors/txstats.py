@@ -5,48 +5,39 @@ Collects opcodes, stack sizes, memory sizes, and storage access statistics.
 """
 
 import os
-import json
+import shutil
+from collections import Counter
 from utils.tools import (
     add_to_dict,
     remove_extra_zeros,
     cast_trace_run,
-    count_and_sort,
     get_statistics,
     convert_hexbytes_to_str,
+    write_json,
 )
 from utils.collect_pre import collect_from_steps
 from utils.opcodes import OPCODE_MAP
 
+# opcode byte -> name, unknown opcodes keep their hex code
+_OP_NAMES = [OPCODE_MAP.get(f"{i:X}", f"{i:X}") for i in range(256)]
 
-def process_reference(opcode_counts):
-    """Transform opcode hex codes into readable names."""
-    result = {}
-    for key, value in opcode_counts.items():
-        new_key = OPCODE_MAP.get(key, key)
-        if new_key in result:
-            result[new_key] += value
-        else:
-            result[new_key] = value
+
+def count_opcodes(opcodes):
+    """Count executed opcode bytes and key the counts by opcode name, most frequent first."""
+    # Name each distinct opcode once instead of converting every step
+    result = {_OP_NAMES[op]: count for op, count in Counter(opcodes).items()}
     return dict(sorted(result.items(), key=lambda x: (-x[1], x[0])))
 
 
 def collect_steps(steps):
     """Collect information from execution steps."""
-    opcode_list = []
-    stack_size_list = []
-    memory_size_list = []
-    accessed_addresses = set()
-    max_depth = 0
-
-    for step in steps:
-        op_code = hex(step["op"])[2:].upper()
-        opcode_list.append(op_code)
-        max_depth = max(max_depth, step["depth"])
-        stack_size_list.append(len(step["stack"]))
-        memory_size_list.append((len(step["memory"]) - 2) / 2)
-        accessed_addresses.add(step.get("contract"))
-
-    accessed_addresses = list(accessed_addresses)
+    # Extract each field column-wise, comprehensions avoid per-step append and max() calls
+    opcode_list = [step["op"] for step in steps]
+    stack_size_list = [len(step["stack"]) for step in steps]
+    # memory is a 0x-prefixed hex string, two characters per byte
+    memory_size_list = [(len(step["memory"]) - 2) >> 1 for step in steps]
+    accessed_addresses = {step.get("contract") for step in steps}
+    max_depth = max((step["depth"] for step in steps), default=0)
 
     return {
         "opcodes": opcode_list,
@@ -93,7 +84,7 @@ def collect_lists(result_list):
     full_opcode_list = []
     full_stack_size_list = []
     full_memory_size_list = []
-    address_list = []
+    address_set = set()
     depth_list = []
     call_data_length = []
     call_return_length = []
@@ -105,7 +96,7 @@ def collect_lists(result_list):
         full_opcode_list.extend(output_dict["opcodes"])
         full_stack_size_list.extend(output_dict["stack_sizes"])
         full_memory_size_list.extend(output_dict["memory_sizes"])
-        address_list.extend(output_dict["addresses"])
+        address_set.update(output_dict["addresses"])
         depth_list.append(output_dict["max_depth"])
 
         data_length, return_length = process_call(t)
@@ -116,9 +107,8 @@ def collect_lists(result_list):
     storage_accessed = collect_storage_accessed(result_list)
 
     # Get statistics from all lists
-    address_list = list(set(address_list))
-    opcode_count = count_and_sort(full_opcode_list)
-    opcode_name_count = process_reference(opcode_count)
+    address_list = list(address_set)
+    opcode_name_count = count_opcodes(full_opcode_list)
     stack_size_statistics = get_statistics(full_stack_size_list)
     memory_size_statistics = get_statistics(full_memory_size_list)
     call_size_statistics = get_statistics(call_data_length)
@@ -159,7 +149,9 @@ def collect_statistics(transaction_hash, endpoint="http://localhost:8545"):
     return transaction_statistics
 
 
-def save_statistics(transaction_hash, output_folder="statsResult", overwrite=False, endpoint="http://localhost:8545"):
+def save_statistics(
+    transaction_hash, output_folder="statsResult", overwrite=False, endpoint="http://localhost:8545", pretty=False
+):
     """
     Collect and save transaction statistics to a JSON file.
 
@@ -168,6 +160,7 @@ def save_statistics(transaction_hash, output_folder="statsResult", overwrite=Fal
         output_folder: Base folder for output files
         overwrite: Whether to overwrite existing results
         endpoint: RPC endpoint URL
+        pretty: Whether to indent txStats.json
 
     Returns:
         True if successful
@@ -178,15 +171,13 @@ def save_statistics(transaction_hash, output_folder="statsResult", overwrite=Fal
     # Create result directory if it doesn't exist
     if overwrite and os.path.exists(folder_prefix):
         print(f"Deleting existing folder to overwrite {transaction_hash}")
-        os.system(f"rm -rf {folder_prefix}")
+        shutil.rmtree(folder_prefix, ignore_errors=True)
 
     transaction_statistics = collect_statistics(transaction_hash, endpoint)
     os.makedirs(folder_prefix, exist_ok=True)
 
     # Convert HexBytes to strings and save as JSON
     transaction_statistics = convert_hexbytes_to_str(transaction_statistics)
-    json_string = json.dumps(transaction_statistics, indent=2)
-    with open(f"{folder_prefix}/txStats.json", "w", encoding="utf-8") as json_file:
-        json_file.write(json_string)
+    write_json(transaction_statistics, f"{folder_prefix}/txStats.json", pretty)
 
     return True
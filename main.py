@@ -51,9 +51,16 @@ Examples:
     )
     parser.add_argument("-o", "--output", help="Output folder (default varies by command)")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing results")
+    parser.add_argument("--pretty", action="store_true", help="Indent JSON result files (default: compact)")
     parser.add_argument(
         "--max-attempts", type=int, default=3, help="Maximum retry attempts for batch/block operations (default: 3)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Concurrent transactions for multi-tx/batch/block operations (default: 8)",
+    )
 
     # Command options (mutually exclusive)
     commands = parser.add_mutually_exclusive_group(required=True)
@@ -94,13 +101,18 @@ def main():
             if "," in args.tx:
                 # Multiple transactions
                 count = collect_multiple_transactions(
-                    args.tx, output_folder=output, overwrite=args.overwrite, endpoint=args.endpoint
+                    args.tx,
+                    output_folder=output,
+                    overwrite=args.overwrite,
+                    endpoint=args.endpoint,
+                    pretty=args.pretty,
+                    workers=args.workers,
                 )
                 print(f"\nSuccessfully collected {count} transaction(s)")
             else:
                 # Single transaction
                 collect_transaction_data(
-                    args.tx, output_folder=output, overwrite=args.overwrite, endpoint=args.endpoint
+                    args.tx, output_folder=output, overwrite=args.overwrite, endpoint=args.endpoint, pretty=args.pretty
                 )
                 print(f"\nSuccessfully collected transaction {args.tx}")
 
@@ -112,6 +124,8 @@ def main():
                 overwrite=args.overwrite,
                 max_attempts=args.max_attempts,
                 endpoint=args.endpoint,
+                workers=args.workers,
+                pretty=args.pretty,
             )
             print(f'\nBatch collection completed: {stats["successful"]}/{stats["total_transactions"]} successful')
 
@@ -124,19 +138,25 @@ def main():
                 overwrite=args.overwrite,
                 max_attempts=args.max_attempts,
                 endpoint=args.endpoint,
+                workers=args.workers,
+                pretty=args.pretty,
             )
             print(f'\nBlock collection completed: {stats["successful"]}/{stats["total_transactions"]} successful')
 
         # Handle environment info only
         elif args.env:
             output = args.output or "envInfoResult"
-            save_envinfo(args.env, output_folder=output, overwrite=args.overwrite, endpoint=args.endpoint)
+            save_envinfo(
+                args.env, output_folder=output, overwrite=args.overwrite, endpoint=args.endpoint, pretty=args.pretty
+            )
             print(f"\nSuccessfully collected environment info for {args.env}")
 
         # Handle statistics only
         elif args.stats:
             output = args.output or "statsResult"
-            save_statistics(args.stats, output_folder=output, overwrite=args.overwrite, endpoint=args.endpoint)
+            save_statistics(
+                args.stats, output_folder=output, overwrite=args.overwrite, endpoint=args.endpoint, pretty=args.pretty
+            )
             print(f"\nSuccessfully collected statistics for {args.stats}")
 
         return 0
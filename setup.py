@@ -25,8 +25,12 @@ setup(
     install_requires=[
         "web3>=6.0.0",
         "hexbytes>=0.3.0",
+        "requests>=2.20.0",
         "matplotlib>=3.5.0",
     ],
+    extras_require={
+        "speedups": ["orjson>=3.0.0", "msgpack>=1.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "cuevm-collect=main:main",
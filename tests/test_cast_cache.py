@@ -0,0 +1,44 @@
+"""Tests for caching parsed cast output."""
+
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import cast_cache
+from utils.tools import cast_trace_run_with_steps
+
+TX_HASH = "0x" + "ab" * 32
+
+
+def cast_output(stdout):
+    return subprocess.CompletedProcess(["cast"], 0, stdout=stdout, stderr="")
+
+
+class TraceCacheTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        for patcher in (
+            mock.patch.object(cast_cache, "CACHE_DIR", folder.name),
+            mock.patch.dict(os.environ, {"CAST_CACHE": "1"}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @mock.patch("utils.tools.subprocess.run", return_value=cast_output(json.dumps({"error": "unsupported"})))
+    def test_output_without_arena_is_not_cached(self, run):
+        self.assertEqual(cast_trace_run_with_steps(TX_HASH, "http://unused"), ([], []))
+        self.assertIsNone(cast_cache.load_cached("trace", TX_HASH, "http://unused"))
+
+    def test_arena_is_cached(self):
+        arena = [{"idx": 0, "trace": {"steps": []}}]
+        with mock.patch("utils.tools.subprocess.run", return_value=cast_output(json.dumps({"arena": arena}))):
+            cast_trace_run_with_steps(TX_HASH, "http://unused")
+        self.assertEqual(cast_cache.load_cached("trace", TX_HASH, "http://unused"), arena)
+
+
+if __name__ == "__main__":
+    unittest.main()
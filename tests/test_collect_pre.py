@@ -0,0 +1,37 @@
+"""Tests for pre-state storage collection from a cast arena."""
+
+import unittest
+
+from utils.collect_pre import collect_pre_storage
+
+CONTRACT = "0x1111111111111111111111111111111111111111"
+CALLER = "0x2222222222222222222222222222222222222222"
+
+
+def make_step(op, stack, storage_change=None):
+    return {"op": op, "contract": CONTRACT, "stack": stack, "storage_change": storage_change}
+
+
+class CollectPreStorageTest(unittest.TestCase):
+    def test_zero_valued_slot_is_filtered_out(self):
+        steps = [
+            # SSTORE to a slot that was zero before the transaction
+            make_step(0x55, ["0x07", "0x01"], {"key": "0x01", "value": "0x07", "had_value": "0x00"}),
+            # SLOAD of a slot that held a non-zero value
+            make_step(0x54, ["0x02"], {"key": "0x02", "value": "0x05", "had_value": "0x05"}),
+            make_step(0x00, ["0x05"]),
+        ]
+        arena = [{"idx": 0, "trace": {"steps": steps, "caller": CALLER, "address": CONTRACT}}]
+
+        # the arena is passed in, so neither cast nor the RPC endpoint is used
+        address_list, storage_by_address = collect_pre_storage("0x00", "http://unused", trace_list=arena)
+
+        self.assertIn(CONTRACT, address_list)
+        storage = storage_by_address[CONTRACT]
+        self.assertNotIn("0x01", storage)
+        self.assertEqual(storage, {"0x02": "0x05"})
+        self.assertNotIn("0x00", storage.values())
+
+
+if __name__ == "__main__":
+    unittest.main()
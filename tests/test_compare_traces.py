@@ -0,0 +1,51 @@
+"""Tests for EIP-3155 trace comparison."""
+
+import os
+import tempfile
+import unittest
+
+from utils.compare_traces import _compare_streaming, _parse_step
+
+MAX_WORD = 2**256 - 1
+
+
+class CompareTracesTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def write_trace(self, name, stack_value):
+        # a one-step trace with a decimal stack value wider than 64 bits
+        path = os.path.join(self.folder.name, name)
+        with open(path, "w") as f:
+            f.write(f'{{"pc":0,"op":96,"gas":"0x10","stack":[{stack_value}]}}\n')
+        return path
+
+    def test_wide_decimal_stack_values_keep_precision(self):
+        path = self.write_trace("trace.json", MAX_WORD)
+        with open(path, "rb") as f:
+            step = _parse_step(f.read())
+        self.assertEqual(step["stack"], [MAX_WORD])
+
+    def test_wide_decimal_stack_values_that_differ_mismatch(self):
+        file1 = self.write_trace("trace1.json", MAX_WORD)
+        file2 = self.write_trace("trace2.json", MAX_WORD - 1)
+
+        mismatch, _, (length1, _), (length2, _) = _compare_streaming(file1, file2, skip_gas=False)
+
+        self.assertEqual((length1, length2), (1, 1))
+        self.assertIsNotNone(mismatch)
+        self.assertEqual(mismatch[0], 0)
+        self.assertIn("Stack mismatch", mismatch[1])
+
+    def test_equal_wide_decimal_stack_values_match(self):
+        file1 = self.write_trace("trace1.json", MAX_WORD)
+        file2 = self.write_trace("trace2.json", MAX_WORD)
+
+        mismatch, _, _, _ = _compare_streaming(file1, file2, skip_gas=False)
+
+        self.assertIsNone(mismatch)
+
+
+if __name__ == "__main__":
+    unittest.main()
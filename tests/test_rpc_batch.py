@@ -0,0 +1,49 @@
+"""Tests for batched JSON-RPC calls."""
+
+import unittest
+from unittest import mock
+
+from utils.collect_pre import retrieve_account_state_batch
+from utils.rpc_batch import batch_call
+
+RESULTS = {"eth_getBalance": "0x10", "eth_getTransactionCount": "0x2", "eth_getCode": "0x6000"}
+
+
+def fake_post(endpoint, json, timeout):
+    # answer every call with a canned result, in reverse order as nodes may reorder responses
+    response = mock.Mock()
+    response.json.return_value = [
+        {"jsonrpc": "2.0", "id": call["id"], "result": RESULTS.get(call["method"], call["params"][0])}
+        for call in reversed(json)
+    ]
+    return response
+
+
+@mock.patch("utils.rpc_batch.SESSION.post", side_effect=fake_post)
+class BatchCallTest(unittest.TestCase):
+    def test_calls_are_split_into_bounded_batches(self, post):
+        calls = [{"method": "eth_echo", "params": [i]} for i in range(7)]
+
+        responses = batch_call("http://unused", calls, batch_size=3)
+
+        self.assertEqual([len(c.kwargs["json"]) for c in post.call_args_list], [3, 3, 1])
+        self.assertEqual([response["result"] for response in responses], list(range(7)))
+
+    def test_no_calls_send_no_request(self, post):
+        self.assertEqual(batch_call("http://unused", []), [])
+        post.assert_not_called()
+
+    def test_account_states_are_fetched_in_batches(self, post):
+        addresses = [f"0x{i:040x}" for i in range(5)]
+
+        states = retrieve_account_state_batch("http://unused", addresses, 100, batch_size=4)
+
+        # 3 calls per address, 15 calls in batches of 4
+        self.assertEqual(post.call_count, 4)
+        self.assertEqual(list(states), addresses)
+        for state in states.values():
+            self.assertEqual(state, {"balance": "0x10", "nonce": "0x02", "code": "0x6000"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Tests for single transaction collection."""
+
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from collectors.batch import _collect_with_retries
+
+TX_HASH = "0x" + "ab" * 32
+CAST_ERROR = subprocess.CalledProcessError(1, ["cast", "run", TX_HASH])
+
+
+@mock.patch("collectors.batch.time.sleep")
+@mock.patch("collectors.transaction.cast_trace_run_with_steps", side_effect=CAST_ERROR)
+class CollectWithRetriesTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    @mock.patch("collectors.transaction.collect_transaction", side_effect=ValueError(f"Transaction {TX_HASH} not found"))
+    def test_missing_transaction_is_attempted_once(self, lookup, cast, sleep):
+        success = _collect_with_retries(TX_HASH, self.folder.name, 3, "http://unused")
+
+        self.assertFalse(success)
+        self.assertEqual(cast.call_count, 1)
+        sleep.assert_not_called()
+
+    @mock.patch("collectors.transaction.collect_transaction", return_value=({}, 1))
+    def test_cast_failure_of_known_transaction_is_retried(self, lookup, cast, sleep):
+        success = _collect_with_retries(TX_HASH, self.folder.name, 3, "http://unused")
+
+        self.assertFalse(success)
+        self.assertEqual(cast.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,10 +7,13 @@ EIP-3155 format conversion, and blockchain data collection.
 
 from .tools import (
     is_tx,
+    get_w3,
     add_to_dict,
     strict_extend,
     extend_dict,
     convert_hexbytes_to_str,
+    write_json,
+    loads_json,
     count_and_sort,
     make_hex_even,
     remove_extra_zeros,
@@ -21,6 +24,7 @@ from .tools import (
 from .opcodes import OPCODE_MAP, get_opcode_name
 from .eip3155_simple import (
     parse_trace_line,
+    iter_eip3155_steps,
     convert_trace_lines_to_eip3155,
     save_trace_lines_as_eip3155,
 )
@@ -28,14 +32,18 @@ from .compare_traces import load_trace, compare_traces
 from .collect_env import collect_env, cast_block_run
 from .collect_pre import collect_pre
 from .collect_transaction import collect_transaction
+from .rpc_batch import batch_call, rpc_call
 
 __all__ = [
     # Tools
     "is_tx",
+    "get_w3",
     "add_to_dict",
     "strict_extend",
     "extend_dict",
     "convert_hexbytes_to_str",
+    "write_json",
+    "loads_json",
     "count_and_sort",
     "make_hex_even",
     "remove_extra_zeros",
@@ -47,6 +55,7 @@ __all__ = [
     "get_opcode_name",
     # EIP-3155
     "parse_trace_line",
+    "iter_eip3155_steps",
     "convert_trace_lines_to_eip3155",
     "save_trace_lines_as_eip3155",
     # Compare traces
@@ -57,4 +66,7 @@ __all__ = [
     "collect_pre",
     "collect_transaction",
     "cast_block_run",
+    # RPC
+    "batch_call",
+    "rpc_call",
 ]
@@ -0,0 +1,102 @@
+"""
+On-disk cache for the parsed output of cast commands.
+
+Replaying the same block or transaction again, which is common during
+development, would otherwise fork cast and fetch everything from the node
+again. The cache is opt-in, set CAST_CACHE=1 to enable it. Results are stored
+under ~/.cache/evm-tx-replay, named by a hash of the command, its argument and
+the RPC endpoint URL. Entries are written as msgpack when it is installed,
+which decodes several times faster than JSON for large traces, and as JSON
+otherwise. Only successfully parsed output is cached.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # optional speedup, fall back to the standard json module
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional speedup, cache entries are stored as JSON instead
+    msgpack = None
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "evm-tx-replay")
+
+
+def cache_enabled():
+    """Return True when the cache is enabled with CAST_CACHE=1."""
+    return os.environ.get("CAST_CACHE", "") == "1"
+
+
+def _cache_path(kind, key, rpc_url, extension):
+    # the full URL, endpoints on one host can serve different chains under different paths
+    digest = hashlib.sha1(f"{key}|{rpc_url}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, kind, f"{digest}{extension}")
+
+
+def _decode(data, extension):
+    if extension == ".msgpack":
+        return msgpack.unpackb(data, raw=False)
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _encode(value):
+    """Return (extension, data) for a cache entry, msgpack when possible and JSON otherwise."""
+    if msgpack is not None:
+        try:
+            return ".msgpack", msgpack.packb(value, use_bin_type=True)
+        except (OverflowError, TypeError):
+            # msgpack integers are limited to 64 bits, let JSON handle wider ones
+            pass
+    return ".json", json.dumps(value, separators=(",", ":")).encode()
+
+
+def load_cached(kind, key, rpc_url):
+    """
+    Load a cached cast result.
+
+    Args:
+        kind: Cache namespace, one per cast command
+        key: Block number or transaction hash the command ran for
+        rpc_url: RPC endpoint URL the command ran against
+
+    Returns:
+        The cached value, or None on a miss or when the cache is disabled
+    """
+    if not cache_enabled():
+        return None
+    # entries written before msgpack was installed are still JSON
+    extensions = (".msgpack", ".json") if msgpack is not None else (".json",)
+    for extension in extensions:
+        try:
+            with open(_cache_path(kind, key, rpc_url, extension), "rb") as file:
+                data = file.read()
+            return _decode(data, extension)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def store_cached(kind, key, rpc_url, value):
+    """Store a cast result, ignoring write errors since the cache is only an optimization."""
+    if not cache_enabled():
+        return
+    extension, data = _encode(value)
+    path = _cache_path(kind, key, rpc_url, extension)
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # unique temp file so concurrent writers of the same entry don't clash
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write cast cache {path}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,32 +1,63 @@
 # Function to collect transaction traces and save them as JSON files
-import json
 import os
 import subprocess
-from utils.tools import make_hex_even
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from utils.tools import make_hex_even, loads_json
+from utils.cast_cache import load_cached, store_cached
+from utils.rpc_batch import rpc_call
 
-cast_bin = os.environ.get("CAST_BIN", "cast")
+# set CAST_BIN to fetch blocks through foundry cast instead of the RPC endpoint (for debugging)
+cast_bin = os.environ.get("CAST_BIN")
+
+# block environments fetched in this process, keyed by (block_number, rpc_url)
+ENV_CACHE_SIZE = 256
+_env_cache = {}
+_env_cache_lock = threading.Lock()
 
 
 # collect block using foundry cast
-def cast_block_run(block_number, rpc_url):
+def cast_block(block_number, rpc_url):
     # define the command
-    command = ["cast", "block", str(block_number), "--rpc-url", rpc_url, "--json"]
+    command = [cast_bin, "block", str(block_number), "--rpc-url", rpc_url, "--json"]
 
     # run the command and capture the output
     block_result = subprocess.run(command, capture_output=True, text=True, check=True)
 
     # load block related data
     text_output = block_result.stdout.strip()
-    block_data = json.loads(text_output)
+    return loads_json(text_output)
 
-    return block_data
 
+# collect block with a direct eth_getBlockByNumber call, same data as cast block --json
+# each block is fetched once per process, the shared result is read-only
+@lru_cache(maxsize=ENV_CACHE_SIZE)
+def cast_block_run(block_number, rpc_url):
+    # reuse the output of an earlier run for the same block
+    block_data = load_cached("block", block_number, rpc_url)
+    if block_data is not None:
+        return MappingProxyType(block_data)
 
-def collect_env(block_number, rpc_url):
-    # get block data
-    block_data = cast_block_run(block_number, rpc_url)
+    if cast_bin:
+        block_data = cast_block(block_number, rpc_url)
+    else:
+        request = block_request(block_number)
+        block_data = rpc_call(rpc_url, request["method"], request["params"])
+        if block_data is None:
+            raise ValueError(f"Block {block_number} not found")
 
-    # collect block data from foundry output
+    store_cached("block", block_number, rpc_url, block_data)
+    return MappingProxyType(block_data)
+
+
+# build the JSON-RPC request for a block header
+def block_request(block_number):
+    return {"method": "eth_getBlockByNumber", "params": [hex(block_number), False]}
+
+
+# parse the block environment from block data (cast or eth_getBlockByNumber output)
+def parse_env(block_data):
     block_env = {
         "currentBaseFee": make_hex_even(block_data.get("baseFeePerGas", None)),
         "currentCoinbase": block_data.get("miner", None),
@@ -39,3 +70,34 @@ def collect_env(block_number, rpc_url):
     }
 
     return block_env
+
+
+# look up a block environment fetched earlier, returns None if not cached
+def get_cached_env(block_number, rpc_url):
+    with _env_cache_lock:
+        block_env = _env_cache.get((block_number, rpc_url))
+    return dict(block_env) if block_env is not None else None
+
+
+# remember a block environment so transactions of the same block can share it
+def cache_env(block_number, rpc_url, block_env):
+    with _env_cache_lock:
+        _env_cache[(block_number, rpc_url)] = dict(block_env)
+        # evict the oldest entry
+        if len(_env_cache) > ENV_CACHE_SIZE:
+            del _env_cache[next(iter(_env_cache))]
+
+
+def collect_env(block_number, rpc_url):
+    block_env = get_cached_env(block_number, rpc_url)
+    if block_env is not None:
+        return block_env
+
+    # get block data
+    block_data = cast_block_run(block_number, rpc_url)
+
+    # collect block data from foundry output
+    block_env = parse_env(block_data)
+    cache_env(block_number, rpc_url, block_env)
+
+    return block_env
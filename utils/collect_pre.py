@@ -1,56 +1,68 @@
 # Function to collect transaction traces and save them as JSON files
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from web3 import Web3
-from utils.tools import make_hex_even, remove_extra_zeros, cast_trace_run, add_to_dict, strict_extend, extend_dict
+from utils.tools import (
+    make_hex_even,
+    remove_extra_zeros,
+    cast_trace_run,
+    add_to_dict,
+    extend_dict,
+    get_w3,
+)
+from utils.rpc_batch import batch_call, MAX_BATCH_SIZE
 
+# number of addresses fetched concurrently when single calls are needed
+FETCH_WORKERS = 16
 
-# detect whether a string is an address
-def is_address(evm_str):
-    if isinstance(evm_str, str) and evm_str.startswith("0x") and len(evm_str) == 42:
-        return True
-    else:
-        return False
+# CALL, CALLCODE, DELEGATECALL and STATICCALL take a target address from the stack
+CALL_OPS = frozenset((0xF1, 0xF2, 0xF4, 0xFA))
+# SLOAD and SSTORE
+STORAGE_OPS = frozenset((0x54, 0x55))
 
 
-# get all addresses in a list
-def find_address_in_list(stack_list):
-    address_list = []
-    for element in stack_list:
-        if is_address(element) and element not in address_list:
-            address_list.append(element)
-    return address_list
+# detect whether a string is an address
+def is_address(evm_str):
+    # length first, it rules out most stack values without touching the string
+    return type(evm_str) is str and len(evm_str) == 42 and evm_str[:2] == "0x"
 
 
 # collect all state changes in the steps of a call trace
 def collect_state_changes(steps):
-    address_list = []
+    address_set = set()
     storage_change_dict = {}
     second_storage_dict = {}
-    step_index = 0
-    for step in steps:
+    last_index = len(steps) - 1
+    # bind hot names locally, the loop runs once per step
+    add_address = address_set.add
+    _is_address = is_address
+    call_ops = CALL_OPS
+    storage_ops = STORAGE_OPS
+    for step_index, step in enumerate(steps):
+        contract = step["contract"]
+        op = step["op"]
+        storage_change = step.get("storage_change")
         # collect all steps' contracts
-        address_list = strict_extend(address_list, [step["contract"]])
-        op_code = hex(step["op"])[2:].upper()
+        add_address(contract)
         # collect targets of call steps
-        if op_code in ["F1", "F2", "F4", "FA"]:
-            address_list = strict_extend(address_list, find_address_in_list(step["stack"]))
+        if op in call_ops:
+            address_set.update(element for element in step["stack"] if _is_address(element))
         # if a step has storage change
-        if step["storage_change"]:
-            add_to_dict(storage_change_dict, step["contract"], step["storage_change"])
+        if storage_change:
+            add_to_dict(storage_change_dict, contract, storage_change)
 
         # if the step's opcode is "54" or "55".
-        if op_code in ["54", "55"] and step_index != len(steps) - 1:
-            add_to_dict(second_storage_dict, step["contract"], [step["stack"][-1], steps[step_index + 1]["stack"][-1]])
-        step_index += 1
-    return address_list, storage_change_dict, second_storage_dict
+        if op in storage_ops and step_index != last_index:
+            add_to_dict(second_storage_dict, contract, [step["stack"][-1], steps[step_index + 1]["stack"][-1]])
+    return list(address_set), storage_change_dict, second_storage_dict
 
 
 # collect all addresses from the trace
 def collect_address(trace_address_dict):
-    address_list = []
+    address_set = set()
     for key in trace_address_dict:
-        address_list = strict_extend(address_list, trace_address_dict[key])
-    return address_list
+        address_set.update(trace_address_dict[key])
+    return list(address_set)
 
 
 # collect all keys and corresponded values in the storage change list
@@ -58,8 +70,9 @@ def get_all_keys(storage_list):
     key_dict = {}
     for storage_change in storage_list:
         # make sure that hex is even
-        if make_hex_even(storage_change["key"]) not in key_dict:
-            key_dict[make_hex_even(storage_change["key"])] = make_hex_even(storage_change["had_value"])
+        key = make_hex_even(storage_change["key"])
+        if key not in key_dict:
+            key_dict[key] = make_hex_even(storage_change["had_value"])
     return key_dict
 
 
@@ -76,8 +89,8 @@ def get_storage_keys(trace_storage_dict):
 
 # get all the pre-transaction value from the steps
 def collect_from_steps(json_output):
-    # get addresses from trace
-    trace_address_dict = {}
+    # get addresses from trace, merged across all calls as they are collected
+    address_set = set()
     # get storage changes from trace
     trace_storage_dict = {}
     # get unrecorded storage changes from trace
@@ -86,15 +99,16 @@ def collect_from_steps(json_output):
         # collect trace and related information and store individually
         new_trace = element["trace"]
         address_list, storage_change_dict, second_storage_dict = collect_state_changes(new_trace["steps"])
-        address_list = strict_extend(address_list, [new_trace["caller"].lower(), new_trace["address"].lower()])
+        address_set.update(address_list)
+        address_set.add(new_trace["caller"].lower())
+        address_set.add(new_trace["address"].lower())
         idx = element["idx"]
-        trace_address_dict[idx] = address_list
         trace_storage_dict[idx] = storage_change_dict
         for key in second_storage_dict:
             for value in second_storage_dict[key]:
                 add_to_dict(second_dict, key, value)
     # summarize all addresses and storage changes
-    address_list = collect_address(trace_address_dict)
+    address_list = list(address_set)
     storage_dict = get_storage_keys(trace_storage_dict)
     return address_list, storage_dict, second_dict
 
@@ -132,44 +146,129 @@ def retrieve_code(w3, contract_address, block_number):
         return "0x"
 
 
-# collect all the pre-transaction information
-def collect_pre(transaction_hash, block_number, rpc_url):
+# retrieve balance, nonce and code of an address with one call each
+def retrieve_account_state(w3, address, block_number):
+    checksum_address = Web3.to_checksum_address(address)
+    return {
+        "balance": retrieve_balance(w3, checksum_address, block_number),
+        "nonce": retrieve_nonce(w3, checksum_address, block_number),
+        "code": retrieve_code(w3, checksum_address, block_number),
+    }
+
+
+# build JSON-RPC requests for an account's balance, nonce and code at a block
+def account_state_requests(address, block_number):
+    params = [address, hex(block_number)]
+    return [
+        {"method": "eth_getBalance", "params": params},
+        {"method": "eth_getTransactionCount", "params": params},
+        {"method": "eth_getCode", "params": params},
+    ]
+
+
+# parse balance, nonce and code from the responses to account_state_requests
+# failed responses never get here, parse_account_states retries those with single calls
+def parse_account_state(responses):
+    balance_response, nonce_response, code_response = responses
+    return {
+        "balance": make_hex_even(balance_response["result"]),
+        "nonce": make_hex_even(nonce_response["result"]),
+        "code": code_response["result"],
+    }
+
+
+# parse the account state of every address from the batched account_state_requests responses
+# addresses whose responses are missing or failed (or all of them, if responses is None
+# because the batch was rejected) are retried with single calls, several addresses at a time
+def parse_account_states(rpc_url, address_list, block_number, responses=None):
+    state_dict = {}
+    retry_list = []
+    for i, address in enumerate(address_list):
+        account_responses = responses[3 * i : 3 * i + 3] if responses is not None else []
+        if len(account_responses) == 3 and not any("error" in response for response in account_responses):
+            state_dict[address] = parse_account_state(account_responses)
+        else:
+            retry_list.append(address)
+
+    if retry_list:
+        w3 = get_w3(rpc_url)
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(retry_list))) as executor:
+            states = executor.map(lambda address: retrieve_account_state(w3, address, block_number), retry_list)
+            for address, state in zip(retry_list, states):
+                state_dict[address] = state
+
+    # keep the trace order of the addresses
+    return {address: state_dict[address] for address in address_list}
+
+
+# retrieve balance, nonce and code of all addresses at a block in batch requests of up to batch_size calls
+def retrieve_account_state_batch(rpc_url, address_list, block_number, batch_size=MAX_BATCH_SIZE):
+    calls = []
+    for address in address_list:
+        calls.extend(account_state_requests(address, block_number))
+
+    try:
+        responses = batch_call(rpc_url, calls, batch_size=batch_size)
+    # if the node rejects the batch, fall back to single calls
+    except Exception as e:
+        print("batch retrival error, falling back to single calls:", e)
+        responses = None
+
+    return parse_account_states(rpc_url, address_list, block_number, responses)
+
+
+# normalize the slots read by sload/sstore once per contract, keeping the first value seen for each slot
+def dedupe_second_dict(second_dict):
+    deduped = {}
+    for address, kv_pairs in second_dict.items():
+        slots = {}
+        for key, value in kv_pairs:
+            even_key = make_hex_even(key)
+            if even_key not in slots:
+                slots[even_key] = value
+        deduped[address] = {key: make_hex_even(value) for key, value in slots.items()}
+    return deduped
+
+
+# collect the accessed addresses and their pre-transaction storage from the trace
+# slot values come from the trace itself (SSTORE had_value, SLOAD results), so no
+# per-slot RPC lookups are needed
+# an already collected arena can be passed in to avoid running cast again
+def collect_pre_storage(transaction_hash, rpc_url, trace_list=None):
     # collect trace and get addresses and storages in the trace
-    trace_list = cast_trace_run(transaction_hash, rpc_url)
+    if trace_list is None:
+        trace_list = cast_trace_run(transaction_hash, rpc_url)
     address_list, storage_dict, second_dict = collect_from_steps(trace_list)
+    second_dict = dedupe_second_dict(second_dict)
 
-    # set the previous block and w3
-    previous_block = block_number - 1
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
-
-    pre_dict = {}
+    storage_by_address = {}
 
     # merge the storage dict to address dict
     for address in address_list:
-        if address in storage_dict:
-            storage = storage_dict[address]
-        else:
-            storage = {}
-
-        # get address related information
-        checksum_address = Web3.to_checksum_address(address)
-        balance = retrieve_balance(w3, checksum_address, previous_block)
-        nonce = retrieve_nonce(w3, checksum_address, previous_block)
-        code = retrieve_code(w3, checksum_address, previous_block)
-
-        # add new storage in second dict to storage dict
-        if address in second_dict:
-            checked_address = address
-            for kv_pair in second_dict[checked_address]:
-                key = kv_pair[0]
-                even_key = make_hex_even(key)
-                if even_key not in storage:
-                    storage[even_key] = make_hex_even(kv_pair[1])
-
-        # remove zero values
-        storage = {k: v for k, v in storage.items() if v != "0x00"}
-
-        # add information to pre-transaction dict
-        pre_dict[address] = {"balance": balance, "nonce": nonce, "code": code, "storage": storage}
+        storage = storage_dict.get(address, {})
+
+        # copy the non-zero storage values
+        pre_storage = {k: v for k, v in storage.items() if v != "0x00"}
+
+        # add new non-zero storage in second dict, slots already in the storage dict keep their value even when zero
+        second_storage = second_dict.get(address)
+        if second_storage:
+            pre_storage.update({k: v for k, v in second_storage.items() if k not in storage and v != "0x00"})
+
+        storage_by_address[address] = pre_storage
+
+    return address_list, storage_by_address
+
+
+# collect all the pre-transaction information
+def collect_pre(transaction_hash, block_number, rpc_url):
+    address_list, storage_by_address = collect_pre_storage(transaction_hash, rpc_url)
+
+    # get balance, nonce and code of every address at the previous block in batches
+    pre_dict = retrieve_account_state_batch(rpc_url, address_list, block_number - 1)
+
+    # add storage to pre-transaction dict
+    for address in address_list:
+        pre_dict[address]["storage"] = storage_by_address[address]
 
     return pre_dict
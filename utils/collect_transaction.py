@@ -1,19 +1,18 @@
-from web3 import Web3
 from utils.tools import make_hex_even
+from utils.rpc_batch import rpc_call
 
 
-def collect_transaction(transaction_hash, rpc):
-    try:
-        # initialize Web3 instance with the RPC provider
-        w3 = Web3(Web3.HTTPProvider(rpc))
-        # get transaction details
-        basic_transaction = w3.eth.get_transaction(transaction_hash)
+# build the JSON-RPC request for a transaction
+def transaction_request(transaction_hash):
+    return {"method": "eth_getTransactionByHash", "params": [transaction_hash]}
 
-    except Exception as e:
-        # handle other unexpected exceptions
-        raise RuntimeError(f"An unexpected error occurred: {e}")
 
-    # collect transaction data from web3 output
+# parse transaction data and block number from an eth_getTransactionByHash result
+def parse_transaction(transaction_hash, basic_transaction):
+    if basic_transaction is None:
+        raise ValueError(f"Transaction {transaction_hash} not found")
+
+    # collect transaction data from rpc output
     transaction_data = {
         "data": [basic_transaction.get("input", None)],
         "gasLimit": [make_hex_even(basic_transaction.get("gas", None))],
@@ -24,6 +23,19 @@ def collect_transaction(transaction_hash, rpc):
         "value": [make_hex_even(basic_transaction.get("value", None))],
     }
     # collect block number for next steps
-    block_num = basic_transaction.get("blockNumber", None)
+    block_num = int(basic_transaction["blockNumber"], 16)
 
     return transaction_data, block_num
+
+
+def collect_transaction(transaction_hash, rpc):
+    try:
+        # get transaction details, a single call since some nodes reject batches
+        request = transaction_request(transaction_hash)
+        basic_transaction = rpc_call(rpc, request["method"], request["params"])
+
+    except Exception as e:
+        # handle other unexpected exceptions
+        raise RuntimeError(f"An unexpected error occurred: {e}")
+
+    return parse_transaction(transaction_hash, basic_transaction)
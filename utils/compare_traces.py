@@ -8,8 +8,95 @@ Reports the first mismatch found.
 
 import argparse
 import json
+import os
 import sys
-from typing import List, Dict, Any, Tuple
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice, repeat
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup, fall back to the standard json module
+    orjson = None
+
+
+# Parallel comparison records the byte offset of every Nth step so workers can seek close to their range
+CHECKPOINT_INTERVAL = 4096
+
+# Steps are compared in batches, a batch of identical steps is matched by a single C-level list comparison
+COMPARE_BATCH_SIZE = 1024
+
+
+def _has_float(obj: Any) -> bool:
+    """Check a parsed trace line for floats in its fields or its stack."""
+    if type(obj) is not dict:
+        return False
+    for value in obj.values():
+        if type(value) is float:
+            return True
+        if type(value) is list and any(type(item) is float for item in value):
+            return True
+    return False
+
+
+def _loads(line: bytes) -> Any:
+    """
+    Parse a JSON line, with orjson when installed.
+
+    orjson reads integers wider than 64 bits as floats (or rejects them), so decimal
+    256-bit stack values would lose precision and distinct values could compare equal.
+    Such lines are parsed again with the standard json module, which keeps exact integers.
+    Both parsers accept bytes and raise a ValueError subclass on invalid input.
+    """
+    if orjson is not None:
+        try:
+            obj = orjson.loads(line)
+        except ValueError:
+            pass
+        else:
+            if not _has_float(obj):
+                return obj
+    return json.loads(line)
+
+
+def _parse_step(line: bytes) -> Optional[Dict[str, Any]]:
+    """Parse a non-blank trace line, returning None for lines that are not trace steps."""
+    try:
+        obj = _loads(line)
+    except ValueError:
+        return None
+    # Only include objects with trace fields (pc, op, gas, etc.)
+    return obj if "pc" in obj and "op" in obj else None
+
+
+def iter_trace(file_path: str, counts: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the steps of a trace file (one JSON object per line) without loading it whole.
+
+    Args:
+        file_path: Trace file path
+        counts: Optional dict whose "steps" and "skipped" entries are incremented as lines are read
+
+    Yields:
+        Trace steps in file order
+    """
+    if counts is None:
+        counts = {}
+    counts.setdefault("steps", 0)
+    counts.setdefault("skipped", 0)
+    # Read raw bytes, the parser decodes UTF-8 itself and tolerates surrounding whitespace
+    with open(file_path, "rb") as f:
+        for line in f:
+            if line.isspace():
+                continue
+            obj = _parse_step(line)
+            if obj is not None:
+                counts["steps"] += 1
+                yield obj
+            else:
+                counts["skipped"] += 1
 
 
 def load_trace(file_path: str) -> tuple[List[Dict[str, Any]], int]:
@@ -19,44 +106,32 @@ def load_trace(file_path: str) -> tuple[List[Dict[str, Any]], int]:
     Returns:
         (traces, skipped_lines) tuple
     """
-    traces = []
-    skipped = 0
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                obj = json.loads(line)
-                # Only include objects with trace fields (pc, op, gas, etc.)
-                if "pc" in obj and "op" in obj:
-                    traces.append(obj)
-                else:
-                    skipped += 1
-            except json.JSONDecodeError:
-                skipped += 1
-    return traces, skipped
+    counts = {}
+    traces = list(iter_trace(file_path, counts))
+    return traces, counts["skipped"]
 
 
+@lru_cache(maxsize=1 << 16, typed=True)
 def normalize_value(value: Any) -> str:
     """Normalize values for comparison (handle hex with/without 0x prefix)."""
     if isinstance(value, str):
         # Ensure hex values have 0x prefix and are lowercase
         if value.startswith("0x"):
             return value.lower()
-        # Try to convert decimal to hex for comparison
+        # Try to convert decimal to hex for comparison (hex() output is already lowercase)
         try:
-            return hex(int(value)).lower()
+            return hex(int(value))
         except (ValueError, TypeError):
             return value.lower()
     elif isinstance(value, int):
-        return hex(value).lower()
+        return hex(value)
     return str(value).lower()
 
 
 def normalize_stack(stack: List) -> List[str]:
     """Normalize stack values for comparison."""
-    return [normalize_value(v) for v in stack]
+    # Stack items are almost always 0x-prefixed hex strings, lowercase them directly
+    return [v.lower() if type(v) is str and v[:2] == "0x" else normalize_value(v) for v in stack]
 
 
 def compare_traces(trace1: Dict[str, Any], trace2: Dict[str, Any], skip_gas: bool = False) -> Tuple[bool, str, bool]:
@@ -74,31 +149,267 @@ def compare_traces(trace1: Dict[str, Any], trace2: Dict[str, Any], skip_gas: boo
         - error_message: Description of mismatch if any
         - gas_mismatch: True if gas values differ
     """
+    # Raw fields that are already equal normalize equally, skip normalization
+    if trace1 is trace2 or (
+        trace1.get("pc") == trace2.get("pc")
+        and trace1.get("op") == trace2.get("op")
+        and trace1.get("gas") == trace2.get("gas")
+        and trace1.get("stack") == trace2.get("stack")
+    ):
+        return True, "", False
+
     gas_mismatch = False
 
+    # Each field is only normalized when its raw values differ
+
     # Compare PC
-    if normalize_value(trace1.get("pc", 0)) != normalize_value(trace2.get("pc", 0)):
+    pc1, pc2 = trace1.get("pc", 0), trace2.get("pc", 0)
+    if pc1 != pc2 and normalize_value(pc1) != normalize_value(pc2):
         return False, f"PC mismatch: {trace1.get('pc')} vs {trace2.get('pc')}", gas_mismatch
 
     # Compare opcode
-    if normalize_value(trace1.get("op", 0)) != normalize_value(trace2.get("op", 0)):
+    op1, op2 = trace1.get("op", 0), trace2.get("op", 0)
+    if op1 != op2 and normalize_value(op1) != normalize_value(op2):
         return False, f"Opcode mismatch: {trace1.get('op')} vs {trace2.get('op')}", gas_mismatch
 
     # Check gas (always check for reporting, but only fail if not skipped)
-    if normalize_value(trace1.get("gas", "0x0")) != normalize_value(trace2.get("gas", "0x0")):
+    gas1, gas2 = trace1.get("gas", "0x0"), trace2.get("gas", "0x0")
+    if gas1 != gas2 and normalize_value(gas1) != normalize_value(gas2):
         gas_mismatch = True
         if not skip_gas:
             return False, f"Gas mismatch: {trace1.get('gas')} vs {trace2.get('gas')}", gas_mismatch
 
     # Compare stack
-    stack1 = normalize_stack(trace1.get("stack", []))
-    stack2 = normalize_stack(trace2.get("stack", []))
-    if stack1 != stack2:
+    stack1, stack2 = trace1.get("stack", []), trace2.get("stack", [])
+    if stack1 != stack2 and normalize_stack(stack1) != normalize_stack(stack2):
         return False, f"Stack mismatch: {len(stack1)} items vs {len(stack2)} items", gas_mismatch
 
     return True, "", gas_mismatch
 
 
+def _compare_steps(steps1: Iterator, steps2: Iterator, skip_gas: bool, start: int = 0, count: Optional[int] = None):
+    """
+    Compare two step iterators, stopping at the first mismatch.
+
+    Steps are read in batches. A batch whose steps are equal dicts in both
+    iterators matches without comparing step by step, only differing batches
+    (e.g. a different number format or an opName field on one side) fall back
+    to compare_traces for each step.
+
+    Args:
+        steps1: Steps of the first trace
+        steps2: Steps of the second trace
+        skip_gas: If True, skip gas comparison for pass/fail determination
+        start: Step index of the first step, for reporting
+        count: Maximum number of steps to compare (default: until either iterator ends)
+
+    Returns:
+        (mismatch, gas_mismatch_count) tuple, counting gas mismatches up to and including the mismatch
+    """
+    gas_mismatch_count = 0
+    index = start
+    remaining = count
+    while remaining is None or remaining > 0:
+        size = COMPARE_BATCH_SIZE if remaining is None else min(COMPARE_BATCH_SIZE, remaining)
+        batch1 = list(islice(steps1, size))
+        batch2 = list(islice(steps2, size))
+        length = min(len(batch1), len(batch2))
+        if length < size:
+            del batch1[length:], batch2[length:]
+
+        if batch1 != batch2:
+            for i, (step1, step2) in enumerate(zip(batch1, batch2)):
+                matches, error, gas_mismatch = compare_traces(step1, step2, skip_gas=skip_gas)
+
+                if gas_mismatch:
+                    gas_mismatch_count += 1
+
+                if not matches:
+                    return (index + i, error, step1, step2), gas_mismatch_count
+
+        index += length
+        if remaining is not None:
+            remaining -= length
+        if length < size:
+            break
+    return None, gas_mismatch_count
+
+
+def _compare_streaming(file1: str, file2: str, skip_gas: bool):
+    """
+    Compare two trace files step by step in a single process.
+
+    Both files are streamed in lockstep so memory use does not grow with trace length.
+
+    Returns:
+        (mismatch, gas_mismatch_count, (length1, skipped1), (length2, skipped2)) tuple
+        - mismatch: None, or (index, error_message, step1, step2) of the first mismatching step
+    """
+    counts1 = {"steps": 0, "skipped": 0}
+    counts2 = {"steps": 0, "skipped": 0}
+    steps1 = iter_trace(file1, counts1)
+    steps2 = iter_trace(file2, counts2)
+
+    mismatch, gas_mismatch_count = _compare_steps(steps1, steps2, skip_gas)
+
+    # Read the rest of both files to count their full lengths
+    for _ in steps1:
+        pass
+    for _ in steps2:
+        pass
+
+    return mismatch, gas_mismatch_count, (counts1["steps"], counts1["skipped"]), (counts2["steps"], counts2["skipped"])
+
+
+def _chunk_bounds(file_path: str, chunks: int) -> List[int]:
+    """Split a file into byte ranges of roughly equal size that start at line boundaries."""
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        for i in range(1, chunks):
+            position = size * i // chunks
+            if position > 0:
+                # Move to the start of the next line
+                f.seek(position - 1)
+                f.readline()
+                position = f.tell()
+            bounds.append(max(position, bounds[-1]))
+    bounds.append(size)
+    return bounds
+
+
+def _index_chunk(file_path: str, start: int, end: int) -> Tuple[int, int, List[Tuple[int, int]]]:
+    """
+    Count the steps and skipped lines of the lines starting in a byte range.
+
+    Returns:
+        (steps, skipped, checkpoints) tuple, checkpoints being (step_index, byte_offset)
+        pairs for every CHECKPOINT_INTERVAL-th step of the range
+    """
+    steps = 0
+    skipped = 0
+    checkpoints = []
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        offset = start
+        while offset < end:
+            line = f.readline()
+            if not line:
+                break
+            line_offset = offset
+            offset += len(line)
+            if line.isspace():
+                continue
+            if _parse_step(line) is None:
+                skipped += 1
+                continue
+            if steps % CHECKPOINT_INTERVAL == 0:
+                checkpoints.append((steps, line_offset))
+            steps += 1
+    return steps, skipped, checkpoints
+
+
+def _index_trace(executor: ProcessPoolExecutor, file_path: str, chunks: int) -> Tuple[int, int, List[Tuple[int, int]]]:
+    """Index a trace file in parallel, returning its (length, skipped, checkpoints) with global step indexes."""
+    bounds = _chunk_bounds(file_path, chunks)
+    length = 0
+    skipped = 0
+    checkpoints = []
+    for steps, chunk_skipped, chunk_checkpoints in executor.map(_index_chunk, repeat(file_path), bounds, bounds[1:]):
+        checkpoints.extend((length + index, offset) for index, offset in chunk_checkpoints)
+        length += steps
+        skipped += chunk_skipped
+    return length, skipped, checkpoints
+
+
+def _find_checkpoint(checkpoints: List[Tuple[int, int]], step: int) -> Tuple[int, int]:
+    """Return the last (step_index, byte_offset) checkpoint at or before a step."""
+    position = bisect_right(checkpoints, (step, sys.maxsize)) - 1
+    return checkpoints[position] if position >= 0 else (0, 0)
+
+
+def _steps_from(f, checkpoint: Tuple[int, int], start_step: int) -> Iterator[Dict[str, Any]]:
+    """Yield the steps of an open trace file from start_step on, reading forward from a checkpoint."""
+    step_index, offset = checkpoint
+    f.seek(offset)
+    for line in f:
+        if line.isspace():
+            continue
+        obj = _parse_step(line)
+        if obj is None:
+            continue
+        if step_index >= start_step:
+            yield obj
+        step_index += 1
+
+
+def _compare_range(
+    file1: str,
+    file2: str,
+    start_step: int,
+    end_step: int,
+    checkpoint1: Tuple[int, int],
+    checkpoint2: Tuple[int, int],
+    skip_gas: bool,
+):
+    """
+    Compare steps [start_step, end_step) of two trace files, stopping at the first mismatch.
+
+    Returns:
+        (mismatch, gas_mismatch_count) tuple, counting gas mismatches up to and including the mismatch
+    """
+    with open(file1, "rb") as f1, open(file2, "rb") as f2:
+        steps1 = _steps_from(f1, checkpoint1, start_step)
+        steps2 = _steps_from(f2, checkpoint2, start_step)
+        return _compare_steps(steps1, steps2, skip_gas, start_step, end_step - start_step)
+
+
+def _compare_parallel(file1: str, file2: str, skip_gas: bool, jobs: int):
+    """
+    Compare two trace files with a pool of worker processes.
+
+    Both files are first indexed in parallel, then the common step range is split
+    into one range per worker. The earliest mismatching range decides the result,
+    so the first mismatch reported is the same as in a sequential comparison.
+
+    Returns:
+        Same tuple as _compare_streaming
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        length1, skipped1, checkpoints1 = _index_trace(executor, file1, jobs)
+        length2, skipped2, checkpoints2 = _index_trace(executor, file2, jobs)
+
+        min_length = min(length1, length2)
+        bounds = [min_length * i // jobs for i in range(jobs + 1)]
+        futures = [
+            executor.submit(
+                _compare_range,
+                file1,
+                file2,
+                start,
+                end,
+                _find_checkpoint(checkpoints1, start),
+                _find_checkpoint(checkpoints2, start),
+                skip_gas,
+            )
+            for start, end in zip(bounds, bounds[1:])
+            if start < end
+        ]
+
+        # Collect in step order, the first range with a mismatch holds the first mismatch overall
+        mismatch = None
+        gas_mismatch_count = 0
+        for future in futures:
+            range_mismatch, range_gas_mismatch_count = future.result()
+            gas_mismatch_count += range_gas_mismatch_count
+            if range_mismatch is not None:
+                mismatch = range_mismatch
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
+
+    return mismatch, gas_mismatch_count, (length1, skipped1), (length2, skipped2)
+
+
 def main():
     """Main comparison function."""
     parser = argparse.ArgumentParser(
@@ -117,6 +428,13 @@ Example:
         action="store_true",
         help="Skip gas comparison (only check PC, opcode, and stack)",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Compare with N worker processes, for very large traces (default: 1)",
+    )
 
     args = parser.parse_args()
 
@@ -126,59 +444,53 @@ Example:
     if args.no_gas:
         print("  Mode: Skipping gas comparison (checking PC, opcode, stack only)")
 
-    traces1, skipped1 = load_trace(args.file1)
-    traces2, skipped2 = load_trace(args.file2)
+    print("\nComparing traces...")
+
+    if args.jobs > 1:
+        result = _compare_parallel(args.file1, args.file2, args.no_gas, args.jobs)
+    else:
+        result = _compare_streaming(args.file1, args.file2, args.no_gas)
+    mismatch, gas_mismatch_count, (length1, skipped1), (length2, skipped2) = result
+    min_length = min(length1, length2)
+
+    all_match = mismatch is None
+    if not all_match:
+        i, error, step1, step2 = mismatch
+        print(f"\n❌ MISMATCH at step {i + 1} (index {i}):")
+        print(f"   {error}")
+        print(f"\n   File 1: {args.file1}")
+        print(f"   {json.dumps(step1, indent=4)}")
+        print(f"\n   File 2: {args.file2}")
+        print(f"   {json.dumps(step2, indent=4)}")
 
     print("\nTrace lengths:")
-    print(f"  File 1: {len(traces1)} steps", end="")
+    print(f"  File 1: {length1} steps", end="")
     if skipped1 > 0:
         print(f" ({skipped1} non-trace lines skipped)", end="")
     print()
-    print(f"  File 2: {len(traces2)} steps", end="")
+    print(f"  File 2: {length2} steps", end="")
     if skipped2 > 0:
         print(f" ({skipped2} non-trace lines skipped)", end="")
     print()
 
-    if len(traces1) != len(traces2):
+    if length1 != length2:
         print("\n⚠️  WARNING: Trace lengths differ!")
 
-    print("\nComparing traces...")
-
-    min_length = min(len(traces1), len(traces2))
-    all_match = True
-    gas_mismatch_count = 0
-
-    for i in range(min_length):
-        matches, error, gas_mismatch = compare_traces(traces1[i], traces2[i], skip_gas=args.no_gas)
-
-        if gas_mismatch:
-            gas_mismatch_count += 1
-
-        if not matches:
-            all_match = False
-            print(f"\n❌ MISMATCH at step {i + 1} (index {i}):")
-            print(f"   {error}")
-            print(f"\n   File 1: {args.file1}")
-            print(f"   {json.dumps(traces1[i], indent=4)}")
-            print(f"\n   File 2: {args.file2}")
-            print(f"   {json.dumps(traces2[i], indent=4)}")
-            break
-
     if all_match:
-        if len(traces1) == len(traces2):
-            print(f"\n✅ SUCCESS: All {len(traces1)} trace steps match perfectly!")
+        if length1 == length2:
+            print(f"\n✅ SUCCESS: All {length1} trace steps match perfectly!")
             if args.no_gas and gas_mismatch_count > 0:
                 print(f"   (Note: {gas_mismatch_count} steps had gas mismatches, but were ignored)")
         else:
             print(f"\n⚠️  First {min_length} steps match, but trace lengths differ.")
-            if len(traces1) > len(traces2):
-                print(f"   File 1 has {len(traces1) - len(traces2)} extra steps")
+            if length1 > length2:
+                print(f"   File 1 has {length1 - length2} extra steps")
             else:
-                print(f"   File 2 has {len(traces2) - len(traces1)} extra steps")
+                print(f"   File 2 has {length2 - length1} extra steps")
             if args.no_gas and gas_mismatch_count > 0:
                 print(f"   (Note: {gas_mismatch_count} steps had gas mismatches, but were ignored)")
 
-    return 0 if all_match and len(traces1) == len(traces2) else 1
+    return 0 if all_match and length1 == length2 else 1
 
 
 if __name__ == "__main__":
@@ -7,8 +7,135 @@ since cast -t has incorrect gas when depth changes (after RETURN, REVERT, etc.).
 """
 
 import json
+import os
 import re
-from typing import List, Dict, Any, Tuple, Optional
+import tempfile
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Any, Tuple, Optional
+
+from .opcodes import OPCODE_MAP
+
+try:
+    import orjson
+except ImportError:  # optional speedup, fall back to the standard json module
+    orjson = None
+
+# trace line fields, compiled once since parse_trace_line runs for every step
+_DEPTH_RE = re.compile(r"depth:(\d+)")
+_PC_RE = re.compile(r"PC:(\d+)")
+_GAS_RE = re.compile(r"gas:(0x[0-9a-f]+)", re.IGNORECASE)
+_OP_RE = re.compile(r'OPCODE:\s*"[^"]+"\((\d+)\)')
+_REFUND_RE = re.compile(r"refund:(0x[0-9a-f]+)", re.IGNORECASE)
+_STACK_RE = re.compile(r"Stack:\[([^\]]*)\]")
+_DATA_SIZE_RE = re.compile(r"Data size:\s*(\d+)")
+
+# opName of every byte value, indexed by the opcode number
+_OP_NAMES = [OPCODE_MAP.get(f"{op:X}", f"UNKNOWN_{op:X}") for op in range(256)]
+
+# steps serialized per write when saving a trace file
+TRACE_WRITE_BATCH = 8192
+
+# compact separators, the layout shown in the README and emitted by evm --json
+_encode_step = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def _dumps_step(step: Dict[str, Any]) -> bytes:
+    """Serialize one step as compact JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(step)
+        except TypeError:
+            # orjson rejects integers wider than 64 bits, let json handle those
+            pass
+    return _encode_step(step).encode()
+
+
+def _parse_stack(stack_str: str) -> List[str]:
+    """
+    Convert the decimal stack items of a trace line to hex strings.
+
+    The hex form is what both the EIP-3155 output and the arena gas lookup keys use,
+    so each item is converted once here.
+
+    Raises:
+        ValueError: On an empty item, e.g. a trailing comma
+    """
+    if not stack_str or stack_str.isspace():
+        return []
+    # int() ignores the spaces around each item
+    return [hex(int(s)) for s in stack_str.split(",")]
+
+
+def _split_trace_line(line: str) -> Dict[str, Any]:
+    """
+    Parse a trace line in the exact cast -t layout by splitting on its fixed delimiters.
+
+    Raises:
+        ValueError: If the line deviates from the layout
+    """
+    depth_str, _, rest = line[6:].partition(", PC:")
+    pc_str, _, rest = rest.partition(", gas:")
+    gas, _, rest = rest.partition("(")
+    _, _, rest = rest.partition('OPCODE: "')
+    _, _, rest = rest.partition('"(')
+    op_str, _, rest = rest.partition(")")
+    _, _, rest = rest.partition("refund:")
+    refund_str, _, rest = rest.partition("(")
+    _, _, rest = rest.partition("Stack:[")
+    stack_str, _, rest = rest.partition("]")
+    _, _, data_size_str = rest.partition(", Data size:")
+
+    # a missing delimiter leaves an empty field, which int() rejects
+    if gas[:2] != "0x" or refund_str[:2] != "0x":
+        raise ValueError(f"Unexpected trace line layout: {line}")
+
+    return {
+        "depth": int(depth_str),
+        "pc": int(pc_str),
+        "gas": gas,
+        "op": int(op_str),
+        "refund": int(refund_str, 16),
+        "stack": _parse_stack(stack_str),
+        "memSize": int(data_size_str),
+    }
+
+
+def _search_trace_line(line: str) -> Dict[str, Any]:
+    """Parse a trace line field by field with regexes, using defaults for missing fields."""
+    # Parse depth
+    depth_match = _DEPTH_RE.search(line)
+    depth = int(depth_match.group(1)) if depth_match else 1
+
+    # Parse PC
+    pc_match = _PC_RE.search(line)
+    pc = int(pc_match.group(1)) if pc_match else 0
+
+    # Parse gas (hex value before parenthesis)
+    gas_match = _GAS_RE.search(line)
+    gas = gas_match.group(1) if gas_match else "0x0"
+
+    # Parse opcode number (in parenthesis after OPCODE)
+    op_match = _OP_RE.search(line)
+    op = int(op_match.group(1)) if op_match else 0
+
+    # Parse refund (hex value before parenthesis)
+    refund_match = _REFUND_RE.search(line)
+    refund = int(refund_match.group(1), 16) if refund_match else 0
+
+    # Parse stack
+    stack_match = _STACK_RE.search(line)
+    stack = []
+    if stack_match:
+        stack_str = stack_match.group(1).strip()
+        if stack_str:
+            # Split by comma and clean up each value, skipping empty items
+            stack = [hex(int(s.strip())) for s in stack_str.split(",") if s.strip()]
+
+    # Parse data size (this becomes memSize)
+    data_size_match = _DATA_SIZE_RE.search(line)
+    mem_size = int(data_size_match.group(1)) if data_size_match else 0
+
+    return {"depth": depth, "pc": pc, "gas": gas, "op": op, "refund": refund, "stack": stack, "memSize": mem_size}
 
 
 def parse_trace_line(line: str) -> Dict[str, Any] | None:
@@ -16,67 +143,36 @@ def parse_trace_line(line: str) -> Dict[str, Any] | None:
     Parse a single trace line from cast -t output.
 
     Format: depth:1, PC:0, gas:0x89f5(35317), OPCODE: "PUSH1"(96)  refund:0x0(0) Stack:[], Data size:0
+
+    Lines in this exact layout are split on their delimiters, anything else falls back to the regexes.
     """
-    line = line.strip()
+    # cast prints trace lines from the first column, only copy a stripped line for the ones it doesn't
+    if not line.startswith("depth:"):
+        line = line.strip()
+        # Skip lines that don't match trace format
+        if not line.startswith("depth:"):
+            return None
 
-    # Skip lines that don't match trace format
-    if not line or not line.startswith("depth:"):
-        return None
+    try:
+        return _split_trace_line(line)
+    except ValueError:
+        pass
 
     try:
-        # Parse depth
-        depth_match = re.search(r"depth:(\d+)", line)
-        depth = int(depth_match.group(1)) if depth_match else 1
-
-        # Parse PC
-        pc_match = re.search(r"PC:(\d+)", line)
-        pc = int(pc_match.group(1)) if pc_match else 0
-
-        # Parse gas (hex value before parenthesis)
-        gas_match = re.search(r"gas:(0x[0-9a-f]+)", line, re.IGNORECASE)
-        gas = gas_match.group(1) if gas_match else "0x0"
-
-        # Parse opcode number (in parenthesis after OPCODE)
-        op_match = re.search(r'OPCODE:\s*"[^"]+"\((\d+)\)', line)
-        op = int(op_match.group(1)) if op_match else 0
-
-        # Parse refund (hex value before parenthesis)
-        refund_match = re.search(r"refund:(0x[0-9a-f]+)", line, re.IGNORECASE)
-        refund = int(refund_match.group(1), 16) if refund_match else 0
-
-        # Parse stack
-        stack_match = re.search(r"Stack:\[([^\]]*)\]", line)
-        stack = []
-        if stack_match:
-            stack_str = stack_match.group(1).strip()
-            if stack_str:
-                # Split by comma and clean up each value
-                stack = [hex(int(s.strip())) for s in stack_str.split(",") if s.strip()]
-
-        # Parse data size (this becomes memSize)
-        data_size_match = re.search(r"Data size:\s*(\d+)", line)
-        mem_size = int(data_size_match.group(1)) if data_size_match else 0
-
-        return {"depth": depth, "pc": pc, "gas": gas, "op": op, "refund": refund, "stack": stack, "memSize": mem_size}
+        return _search_trace_line(line)
     except Exception:
         # Skip lines that can't be parsed
         return None
 
 
-def build_gas_lookup_from_arena(arena: List[Dict[str, Any]]) -> tuple[Dict[Tuple, int], Dict[Tuple, int]]:
+def _build_arena_lookup(arena: List[Dict[str, Any]]) -> Dict[Tuple, Tuple[int, int]]:
     """
-    Build lookup dictionaries from arena JSON.
+    Index arena steps as (depth, pc, op, stack_tuple) -> (gas_remaining, gas_cost).
 
-    Returns:
-        (gas_lookup, gas_cost_lookup) where:
-        - gas_lookup: (depth, pc, op, stack_tuple) -> gas_remaining
-        - gas_cost_lookup: (depth, pc, op, stack_tuple) -> gas_cost
-
-    This provides accurate gas values from arena to correct cast -t bugs.
-    Uses full stack to ensure precise matching.
+    One table means one key hash per arena step, and lookups still compare the
+    full stack, so distinct stacks can never share an entry.
     """
-    gas_lookup = {}
-    gas_cost_lookup = {}
+    lookup = {}
 
     for node in arena:
         trace = node.get("trace")
@@ -94,98 +190,119 @@ def build_gas_lookup_from_arena(arena: List[Dict[str, Any]]) -> tuple[Dict[Tuple
 
             # Convert stack to tuple for hashability
             stack_tuple = tuple(stack)
-            key = (depth, pc, op, stack_tuple)
-            gas_lookup[key] = gas_remaining
-            gas_cost_lookup[key] = gas_cost
+            lookup[(depth, pc, op, stack_tuple)] = (gas_remaining, gas_cost)
+
+    return lookup
+
 
+def build_gas_lookup_from_arena(arena: List[Dict[str, Any]]) -> tuple[Dict[Tuple, int], Dict[Tuple, int]]:
+    """
+    Build lookup dictionaries from arena JSON.
+
+    Returns:
+        (gas_lookup, gas_cost_lookup) where:
+        - gas_lookup: (depth, pc, op, stack_tuple) -> gas_remaining
+        - gas_cost_lookup: (depth, pc, op, stack_tuple) -> gas_cost
+
+    This provides accurate gas values from arena to correct cast -t bugs.
+    Uses full stack to ensure precise matching.
+    """
+    lookup = _build_arena_lookup(arena)
+    gas_lookup = {key: gas_remaining for key, (gas_remaining, _) in lookup.items()}
+    gas_cost_lookup = {key: gas_cost for key, (_, gas_cost) in lookup.items()}
     return gas_lookup, gas_cost_lookup
 
 
-def convert_trace_lines_to_eip3155(
-    trace_lines: List[str], arena: Optional[List[Dict[str, Any]]] = None, include_opname: bool = False
-) -> List[Dict[str, Any]]:
+def _op_name(op: int) -> str:
+    """Return the opName for an opcode number."""
+    if 0 <= op < 256:
+        return _OP_NAMES[op]
+    return OPCODE_MAP.get(f"{op:X}", f"UNKNOWN_{op:X}")
+
+
+def _iter_parsed_steps(trace_lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse trace lines lazily, skipping lines that are not trace steps."""
+    for line in trace_lines:
+        # substring check before calling the parser, drops console and log lines cast prints between steps
+        if "depth:" not in line:
+            continue
+        step = parse_trace_line(line)
+        if step:
+            yield step
+
+
+def iter_eip3155_steps(
+    trace_lines: Iterable[str], arena: Optional[List[Dict[str, Any]]] = None, include_opname: bool = False
+) -> Iterator[Dict[str, Any]]:
     """
-    Convert trace lines from cast -t output to EIP-3155 format.
+    Convert trace lines from cast -t output to EIP-3155 format, yielding one step at a time.
 
     Args:
-        trace_lines: List of trace lines from cast -t output
+        trace_lines: Trace lines from cast -t output, any iterable as lines are read lazily
         arena: Optional arena data for gas correction when depth changes
         include_opname: Whether to include opName field (default: False for CuEVM compatibility)
 
-    Returns:
-        List of EIP-3155 formatted steps
+    Yields:
+        EIP-3155 formatted steps
 
     Note:
         Uses arena gas values for instructions after depth changes (RETURN, REVERT, STOP, etc.)
         because cast -t has incorrect gas in these cases.
     """
-    # Build gas lookup from arena (provides accurate gas values)
-    if arena:
-        arena_gas, arena_gas_cost = build_gas_lookup_from_arena(arena)
-    else:
-        arena_gas, arena_gas_cost = {}, {}
-
-    # Load opcode reference if needed
-    opcode_map = None
-    if include_opname:
-        from .opcodes import OPCODE_MAP
-
-        opcode_map = OPCODE_MAP
+    # Gas lookup from arena (provides accurate gas values), built on first use
+    # since traces where no call or create returns never need it
+    arena_lookup = None
+
+    # Only the previous and next steps are needed, so parse lazily and slide a window over the steps
+    parsed_steps = _iter_parsed_steps(trace_lines)
+    prev_step = None
+    step = next(parsed_steps, None)
+    # trace line gas of each step is parsed once, when the step enters the window as the next step
+    step_gas = int(step["gas"], 16) if step is not None else 0
+    while step is not None:
+        next_step = next(parsed_steps, None)
+        next_gas = int(next_step["gas"], 16) if next_step is not None else 0
+        depth = step["depth"]
 
-    # First pass: parse all trace lines
-    parsed_steps = []
-    for line in trace_lines:
-        step = parse_trace_line(line)
-        if step:
-            parsed_steps.append(step)
-
-    # Second pass: build EIP-3155 steps with corrected gas values
-    eip3155_steps = []
-    for i, step in enumerate(parsed_steps):
         # Use gas from trace line by default
-        current_gas = int(step["gas"], 16)
+        current_gas = step_gas
+
+        # The arena lookup key is only needed around depth changes, build it once and only there
+        lookup_key = None
 
         # Check if depth decreased from previous step (call/create returned)
         # This happens for RETURN, REVERT, STOP, SELFDESTRUCT, or running out of gas
-        if i > 0:
-            prev_step = parsed_steps[i - 1]
+        if prev_step is not None and depth < prev_step["depth"]:
             # If depth decreased, this is first instruction after a call/create - use arena gas
-            if step["depth"] < prev_step["depth"]:
-                stack_tuple = tuple(step["stack"])
-                lookup_key = (step["depth"], step["pc"], step["op"], stack_tuple)
-                if lookup_key in arena_gas:
-                    current_gas = arena_gas[lookup_key]
+            if arena_lookup is None:
+                arena_lookup = _build_arena_lookup(arena) if arena else {}
+            lookup_key = (depth, step["pc"], step["op"], tuple(step["stack"]))
+            entry = arena_lookup.get(lookup_key)
+            if entry is not None:
+                current_gas = entry[0]
 
         # Calculate gasCost
-        stack_tuple = tuple(step["stack"])
-        lookup_key = (step["depth"], step["pc"], step["op"], stack_tuple)
-
-        # Check if next step has depth decrease (current op exits call/create)
-        # Use arena gas_cost for these ops (RETURN, REVERT, STOP, etc.)
-        has_depth_decrease = False
-        if i + 1 < len(parsed_steps):
-            next_step = parsed_steps[i + 1]
-            has_depth_decrease = next_step["depth"] < step["depth"]
-
-        if has_depth_decrease and lookup_key in arena_gas_cost:
-            # Use arena gas_cost for ops that exit call/create
-            gas_cost = arena_gas_cost[lookup_key]
-        elif i + 1 < len(parsed_steps):
-            # Normal case: calculate from gas difference
-            next_step = parsed_steps[i + 1]
-            next_gas = int(next_step["gas"], 16)
-
-            # If next step has depth decrease, use arena gas for it
-            if next_step["depth"] < step["depth"]:
-                next_stack_tuple = tuple(next_step["stack"])
-                next_lookup_key = (next_step["depth"], next_step["pc"], next_step["op"], next_stack_tuple)
-                if next_lookup_key in arena_gas:
-                    next_gas = arena_gas[next_lookup_key]
-
-            gas_cost = current_gas - next_gas
-        else:
+        if next_step is None:
             # Last step
             gas_cost = 0
+        elif next_step["depth"] < depth:
+            # Next step has depth decrease (current op exits call/create)
+            # Use arena gas_cost for these ops (RETURN, REVERT, STOP, etc.)
+            if arena_lookup is None:
+                arena_lookup = _build_arena_lookup(arena) if arena else {}
+            if lookup_key is None:
+                lookup_key = (depth, step["pc"], step["op"], tuple(step["stack"]))
+            entry = arena_lookup.get(lookup_key)
+            if entry is not None:
+                gas_cost = entry[1]
+            else:
+                # Calculate from gas difference, with arena gas for the next step
+                next_lookup_key = (next_step["depth"], next_step["pc"], next_step["op"], tuple(next_step["stack"]))
+                next_entry = arena_lookup.get(next_lookup_key)
+                gas_cost = current_gas - (next_entry[0] if next_entry is not None else next_gas)
+        else:
+            # Normal case: calculate from gas difference
+            gas_cost = current_gas - next_gas
 
         # Build EIP-3155 step
         eip3155_step = {
@@ -195,18 +312,33 @@ def convert_trace_lines_to_eip3155(
             "gasCost": hex(gas_cost),
             "memSize": step["memSize"],
             "stack": step["stack"],
-            "depth": step["depth"],
+            "depth": depth,
             "refund": step["refund"],
         }
 
         # Add opName if requested
-        if include_opname and opcode_map:
-            op_hex = hex(step["op"])[2:].upper()
-            eip3155_step["opName"] = opcode_map.get(op_hex, f"UNKNOWN_{op_hex}")
+        if include_opname:
+            eip3155_step["opName"] = _op_name(step["op"])
 
-        eip3155_steps.append(eip3155_step)
+        yield eip3155_step
+        prev_step, step, step_gas = step, next_step, next_gas
 
-    return eip3155_steps
+
+def convert_trace_lines_to_eip3155(
+    trace_lines: List[str], arena: Optional[List[Dict[str, Any]]] = None, include_opname: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Convert trace lines from cast -t output to EIP-3155 format.
+
+    Args:
+        trace_lines: List of trace lines from cast -t output
+        arena: Optional arena data for gas correction when depth changes
+        include_opname: Whether to include opName field (default: False for CuEVM compatibility)
+
+    Returns:
+        List of EIP-3155 formatted steps
+    """
+    return list(iter_eip3155_steps(trace_lines, arena, include_opname))
 
 
 def save_trace_lines_as_eip3155(
@@ -224,10 +356,26 @@ def save_trace_lines_as_eip3155(
     Returns:
         Number of steps converted
     """
-    eip3155_steps = convert_trace_lines_to_eip3155(trace_lines, arena, include_opname)
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        for step in eip3155_steps:
-            f.write(json.dumps(step) + "\n")
-
-    return len(eip3155_steps)
+    # Write steps in batches as they are converted instead of building the full list first,
+    # into a unique temporary file renamed into place once complete, so concurrent writers don't clash
+    step_count = 0
+    steps = iter_eip3155_steps(trace_lines, arena, include_opname)
+    fd, tmp_file = tempfile.mkstemp(
+        dir=os.path.dirname(output_file) or ".", prefix=f"{os.path.basename(output_file)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                batch = [_dumps_step(step) for step in islice(steps, TRACE_WRITE_BATCH)]
+                if not batch:
+                    break
+                f.write(b"\n".join(batch))
+                f.write(b"\n")
+                step_count += len(batch)
+        os.replace(tmp_file, output_file)
+    finally:
+        # only left behind when converting or writing failed
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    return step_count
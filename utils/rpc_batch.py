@@ -0,0 +1,73 @@
+"""
+Minimal JSON-RPC client with support for batched requests.
+
+A batch packs several calls into a single HTTP POST, so a group of independent
+lookups costs one round-trip to the node instead of one per call.
+"""
+
+from utils.rpc_client import SESSION, TIMEOUT
+
+# calls sent per HTTP POST, many providers reject batches of more than about 100 calls
+MAX_BATCH_SIZE = 50
+
+
+def batch_call(endpoint, calls, timeout=TIMEOUT, batch_size=MAX_BATCH_SIZE):
+    """
+    Submit several JSON-RPC calls in batched HTTP POSTs.
+
+    Args:
+        endpoint: RPC endpoint URL
+        calls: List of {"method": ..., "params": [...]} dicts
+        timeout: Request timeout in seconds, per POST
+        batch_size: Maximum number of calls sent in one POST
+
+    Returns:
+        List of raw JSON-RPC responses (each holding "result" or "error"),
+        in the same order as calls
+    """
+    responses = []
+    for start in range(0, len(calls), batch_size):
+        responses.extend(_post_batch(endpoint, calls[start : start + batch_size], timeout))
+    return responses
+
+
+def _post_batch(endpoint, calls, timeout):
+    """Submit a list of JSON-RPC calls in a single HTTP POST, returning their responses in order."""
+    payload = [{"jsonrpc": "2.0", "id": i, "method": c["method"], "params": c["params"]} for i, c in enumerate(calls)]
+    response = SESSION.post(endpoint, json=payload, timeout=timeout)
+    response.raise_for_status()
+    replies = response.json()
+
+    # Nodes without batch support answer with a single error object
+    if not isinstance(replies, list):
+        raise RuntimeError(f"Batch request rejected by {endpoint}: {replies}")
+
+    # Responses may come back in any order, dispatch them by id
+    by_id = {reply.get("id"): reply for reply in replies}
+    return [by_id.get(i, {"error": {"message": "missing response in batch"}}) for i in range(len(calls))]
+
+
+def rpc_call(endpoint, method, params, timeout=TIMEOUT):
+    """
+    Submit a single JSON-RPC call.
+
+    Args:
+        endpoint: RPC endpoint URL
+        method: JSON-RPC method name
+        params: List of method parameters
+        timeout: Request timeout in seconds
+
+    Returns:
+        The call's result, raising RuntimeError if the node returned an error
+    """
+    payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    response = SESSION.post(endpoint, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return get_result(response.json())
+
+
+def get_result(response):
+    """Return the result of a JSON-RPC response, raising RuntimeError if it holds an error."""
+    if "error" in response:
+        raise RuntimeError(f"RPC error: {response['error']}")
+    return response.get("result")
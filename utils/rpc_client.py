@@ -0,0 +1,18 @@
+"""
+Shared HTTP session for JSON-RPC requests.
+
+Reusing one session keeps connections to the node alive between calls, so
+each request skips the TCP (and TLS) handshake. The pool is sized for the
+concurrent batch workers.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 32
+TIMEOUT = 30
+
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
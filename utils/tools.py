@@ -1,15 +1,42 @@
 import json
+import os
+import re
 import statistics
 import subprocess
+import tempfile
 from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
 from hexbytes import HexBytes
+from web3 import Web3
+from utils.cast_cache import load_cached, store_cached
+from utils.rpc_client import SESSION, TIMEOUT
+
+try:
+    import orjson
+except ImportError:  # optional speedup, fall back to the standard json module
+    orjson = None
+
+_HEX_RE = re.compile(r"[0-9a-fA-F]+")
+
+# values convert_hexbytes_to_str has to look into
+_NESTED_TYPES = (HexBytes, dict, list, tuple)
 
 
 def is_tx(tx_line: str):
-    if isinstance(tx_line, str):
-        if len(tx_line) == 66 and tx_line.startswith("0x"):
-            return True
-    return False
+    # a transaction hash is 0x followed by 64 hex digits
+    return (
+        isinstance(tx_line, str)
+        and len(tx_line) == 66
+        and tx_line.startswith("0x")
+        and _HEX_RE.fullmatch(tx_line, 2) is not None
+    )
+
+
+# get a Web3 client for an endpoint, one per endpoint sharing the pooled keep-alive session
+@lru_cache(maxsize=8)
+def get_w3(rpc_url):
+    return Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"timeout": TIMEOUT}, session=SESSION))
 
 
 # for adding a key-value pair to a dict with auto choose appending
@@ -53,40 +80,142 @@ class HexBytesEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+def _hexbytes_default(obj):
+    if isinstance(obj, HexBytes):
+        return obj.hex()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
 def json_dumps_with_hexbytes(obj, **kwargs):
-    """JSON dumps that handles HexBytes objects."""
+    """
+    JSON dumps that handles HexBytes objects.
+
+    Uses orjson when installed and no json.dumps options are given, the output
+    is then compact but otherwise the same document.
+    """
+    if orjson is not None and not kwargs:
+        try:
+            return orjson.dumps(obj, default=_hexbytes_default).decode()
+        except TypeError:
+            # orjson rejects integers wider than 64 bits, let json handle those
+            pass
     return json.dumps(obj, cls=HexBytesEncoder, **kwargs)
 
 
-def convert_hexbytes_to_str(obj):
-    """Recursively convert HexBytes objects to hex strings."""
-    if isinstance(obj, HexBytes):
-        return obj.hex()
-    elif isinstance(obj, dict):
-        return {k: convert_hexbytes_to_str(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
-        return type(obj)(convert_hexbytes_to_str(item) for item in obj)
-    return obj
+def write_json(obj, file_path, pretty=False):
+    """
+    Write obj as JSON to file_path, compact unless pretty is set (2-space indent).
+
+    Uses orjson when installed, otherwise streams through json.dump so the
+    serialized document is never held in memory as one string.
+
+    The file is written to a temporary path and renamed into place, so an
+    interrupted run never leaves a truncated file behind.
+    """
+    data = None
+    if orjson is not None:
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else None)
+        except TypeError:
+            # orjson rejects integers wider than 64 bits, let json handle those
+            data = None
+
+    # unique temp file so concurrent writers of the same path don't clash
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path) or ".", prefix=f"{os.path.basename(file_path)}.", suffix=".tmp"
+    )
+    try:
+        if data is not None:
+            with os.fdopen(fd, "wb") as json_file:
+                json_file.write(data)
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as json_file:
+                if pretty:
+                    json.dump(obj, json_file, indent=2)
+                else:
+                    json.dump(obj, json_file, separators=(",", ":"))
+        os.replace(tmp_path, file_path)
+    finally:
+        # only left behind when writing failed
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def loads_json(data):
+    """
+    Parse a JSON document from str or bytes, with orjson when installed.
+
+    cast emits 256-bit words as hex strings, so the numbers in its output fit
+    the 64-bit integers orjson decodes exactly.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
+def convert_hexbytes_to_str(obj):
+    """
+    Convert HexBytes objects nested in dicts, lists and tuples to hex strings.
 
+    Containers are copied, the input is left unchanged. The structure is walked
+    with an explicit stack, so deeply nested traces don't hit the recursion limit.
+    """
+    if not isinstance(obj, _NESTED_TYPES):
+        return obj
+
+    nested_types = _NESTED_TYPES
+    root = [obj]
+    stack = [(root, 0)]
+    push = stack.append
+    # copies of tuples and list subclasses, rebuilt as their own type once their items are converted
+    rebuilds = []
+    while stack:
+        parent, key = stack.pop()
+        value = parent[key]
+        value_type = type(value)
+
+        # only values that need converting or looking into are pushed, leaves stay as copied
+        if value_type is dict or (value_type is not list and isinstance(value, dict)):
+            copy = dict(value)
+            for k, v in copy.items():
+                if isinstance(v, nested_types):
+                    push((copy, k))
+        elif isinstance(value, HexBytes):
+            parent[key] = value.hex()
+            continue
+        else:
+            copy = list(value)
+            for i, v in enumerate(copy):
+                if isinstance(v, nested_types):
+                    push((copy, i))
+            if value_type is not list:
+                rebuilds.append((parent, key, value_type, copy))
+        parent[key] = copy
+
+    # children are visited after their parents, rebuild in reverse so nested tuples are done first
+    for parent, key, container_type, copy in reversed(rebuilds):
+        parent[key] = container_type(copy)
+    return root[0]
+
+
+# count items, most common first and ties by key
 def count_and_sort(lst):
-    counts = Counter(lst)
-    return dict(sorted(counts.items(), key=lambda x: (-x[1], x[0])))
+    # sort by key, then stably by descending count, two sorts without a Python key function per item
+    items = sorted(Counter(lst).items())
+    items.sort(key=itemgetter(1), reverse=True)
+    return dict(items)
 
 
+# pure function of a hashable int or hex string, and the same slots and values repeat across a trace
+@lru_cache(maxsize=1 << 14)
 def make_hex_even(value):
-    # Convert the value to hex and remove the '0x' prefix
+    # format an int straight to a whole number of bytes, at least one
     if isinstance(value, int):
-        hex_value = hex(value)[2:]
-    else:
-        hex_value = value[2:]
+        return f"0x{value:0{(value.bit_length() + 7) // 8 * 2 or 2}x}"
 
     # If the length of the hex value is odd, add a leading '0'
-    if len(hex_value) % 2 != 0:
-        hex_value = "0" + hex_value
-
-    # Return the hex value with '0x' prefix
-    return "0x" + hex_value
+    hex_value = value[2:]
+    return "0x0" + hex_value if len(hex_value) % 2 else "0x" + hex_value
 
 
 # remove extra 0 in a hex
@@ -96,8 +225,17 @@ def remove_extra_zeros(hex_str):
         return "0x00"
 
     stripped = hex_str[2:].lstrip("0")
-    str_output = "0x" + (stripped if stripped else "0")
-    return make_hex_even(str_output)
+    if not stripped:
+        return "0x00"
+    return "0x0" + stripped if len(stripped) % 2 else "0x" + stripped
+
+
+# median of an already sorted list, same result as statistics.median without sorting again
+def _sorted_median(ordered):
+    mid = len(ordered) // 2
+    if len(ordered) % 2 == 1:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
 
 
 # get statistics from a list of numbers
@@ -111,18 +249,22 @@ def get_statistics(numbers):
         return {}
 
     try:
+        # sort once for the median, quartiles and extremes
+        ordered = sorted(numbers)
+        count = len(ordered)
+
         # collect various stats
         stats = {
             "Mean": statistics.mean(numbers),
-            "Median": statistics.median(numbers) if len(numbers) > 1 else numbers[0],
-            "Mode": statistics.mode(numbers) if len(set(numbers)) < len(numbers) else None,
-            "Standard Deviation": statistics.stdev(numbers) if len(numbers) > 1 else 0,
-            "Variance": statistics.variance(numbers) if len(numbers) > 1 else 0,
-            "Range": max(numbers) - min(numbers),
-            "Minimum": min(numbers),
-            "Maximum": max(numbers),
-            "Q1": statistics.median(sorted(numbers)[: len(numbers) // 2]) if len(numbers) > 1 else numbers[0],
-            "Q3": statistics.median(sorted(numbers)[(len(numbers) + 1) // 2 :]) if len(numbers) > 1 else numbers[0],
+            "Median": _sorted_median(ordered),
+            "Mode": statistics.mode(numbers) if len(set(numbers)) < count else None,
+            "Standard Deviation": statistics.stdev(numbers) if count > 1 else 0,
+            "Variance": statistics.variance(numbers) if count > 1 else 0,
+            "Range": ordered[-1] - ordered[0],
+            "Minimum": ordered[0],
+            "Maximum": ordered[-1],
+            "Q1": _sorted_median(ordered[: count // 2]) if count > 1 else ordered[0],
+            "Q3": _sorted_median(ordered[(count + 1) // 2 :]) if count > 1 else ordered[0],
             "Count": len(numbers),
             "Sum": sum(numbers),
         }
@@ -145,6 +287,11 @@ def cast_trace_run(transaction_hash, rpc_url):
     Returns:
         Arena data (list of trace nodes)
     """
+    # also written by cast -t runs of the same transaction, which carry the same arena, empty entries count as misses
+    arena = load_cached("trace", transaction_hash, rpc_url)
+    if arena:
+        return arena
+
     command = [
         "cast",
         "run",
@@ -168,9 +315,13 @@ def cast_trace_run(transaction_hash, rpc_url):
     output_lines = lines[traces_index + 1 :]
 
     filtered_output = "\n".join(output_lines)
-    json_output = json.loads(filtered_output)
+    json_output = loads_json(filtered_output)
 
-    return json_output["arena"]
+    arena = json_output["arena"]
+    # an empty arena means cast failed to trace, don't keep it
+    if arena:
+        store_cached("trace", transaction_hash, rpc_url, arena)
+    return arena
 
 
 def cast_trace_run_with_steps(transaction_hash, rpc_url):
@@ -199,25 +350,34 @@ def cast_trace_run_with_steps(transaction_hash, rpc_url):
     ]
 
     result = subprocess.run(command, capture_output=True, text=True, check=True)
-    lines = result.stdout.strip().split("\n")
+    output = result.stdout.strip()
+    lines = output.split("\n")
 
     # Find the last line that starts with "depth:" - this is the last trace line
+    # the JSON comes after the trace, so scanning back from the end only passes over the JSON lines
     last_trace_index = -1
-    for index, line in enumerate(lines):
-        if line.strip().startswith("depth:"):
+    for index in range(len(lines) - 1, -1, -1):
+        line = lines[index]
+        if line.startswith("depth:") or line.lstrip().startswith("depth:"):
             last_trace_index = index
+            break
 
     # Split into trace lines and JSON
     trace_lines = []
     if last_trace_index >= 0:
         trace_lines = lines[: last_trace_index + 1]
-        json_lines = lines[last_trace_index + 1 :]
+        # the JSON follows the trace lines, slice it from the output instead of joining its lines back together
+        json_str = output[sum(map(len, trace_lines)) + len(trace_lines) :]
     else:
         # No trace lines found, everything is JSON
-        json_lines = lines
+        json_str = output
 
     # Parse JSON from remaining lines
-    json_str = "\n".join(json_lines)
-    json_output = json.loads(json_str)
-
-    return trace_lines, json_output.get("arena", [])
+    json_output = loads_json(json_str)
+
+    arena = json_output.get("arena", [])
+    # only the arena is cached, so cast_trace_run can reuse it, the trace lines are too large to keep
+    # output without an arena (a cast error or format change) is never cached
+    if arena:
+        store_cached("trace", transaction_hash, rpc_url, arena)
+    return trace_lines, arena